@@ -0,0 +1,85 @@
+"""Producer/consumer pipeline for streaming chunked inserts"""
+
+import queue
+import threading
+from itertools import islice
+
+# ==================================================
+# Configs
+# ==================================================
+
+CHUNK_SIZE = 10_000
+QUEUE_SIZE = 4  # chunks waiting for the writer; bounds memory
+_PUT_TIMEOUT = 0.1
+_DONE = object()
+
+# ==================================================
+# Helper Functions
+# ==================================================
+
+def chunked(rows, chunk_size: int = CHUNK_SIZE):
+    """Yield lists of up to `chunk_size` rows from any row iterable."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+def _put(chunk_queue, item, stop):
+    """Put `item` unless the writer has stopped. Return False if it has."""
+    while not stop.is_set():
+        try:
+            chunk_queue.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _produce(chunks, chunk_queue, stop):
+    """Producer thread: feed chunks into the queue, then `_DONE` or the exception."""
+    try:
+        for chunk in chunks:
+            if not _put(chunk_queue, chunk, stop):
+                return
+    except Exception as exc:
+        _put(chunk_queue, exc, stop)
+        return
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()  # e.g. stop `generate_chunks`' worker pool early
+    _put(chunk_queue, _DONE, stop)
+
+# ==================================================
+# Pipeline
+# ==================================================
+
+def run_pipeline(chunks, write_chunk, queue_size: int = QUEUE_SIZE):
+    """Write `chunks` with `write_chunk(chunk)` while the next ones are produced.
+
+    `chunks` is consumed on a producer thread and handed over through a
+    queue of at most `queue_size` chunks, so generation and insertion
+    overlap and memory stays at a few chunks however many rows there are.
+    `write_chunk` runs on the calling thread, which owns the database
+    connection; it should insert and commit one chunk. An exception on
+    either side stops both. Return a dict of rows and chunks written and
+    the peak queue depth.
+    """
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(chunks, chunk_queue, stop), daemon=True)
+    metrics = {"rows": 0, "chunks": 0, "peak_queue": 0}
+    producer.start()
+    try:
+        while True:
+            metrics["peak_queue"] = max(metrics["peak_queue"], chunk_queue.qsize())
+            item = chunk_queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            write_chunk(item)
+            metrics["rows"] += len(item)
+            metrics["chunks"] += 1
+    finally:
+        stop.set()
+        producer.join()
+    return metrics
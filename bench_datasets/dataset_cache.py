@@ -0,0 +1,332 @@
+"""Pre-generated, memory-mapped Faker datasets for the benchmarks
+
+    python dataset_cache.py students 100000 [seed]
+
+Faker is slow, so generating rows inside a benchmark mostly times Faker.
+`load_dataset` generates a seeded dataset once, stores it column by
+column in `cache/`, and afterwards only memory-maps the file.
+
+File layout: a fixed header, a JSON column directory, one section per
+column, 8-byte aligned, and a footer of section offsets. Integer and float columns are packed
+`array` data (`q` / `d`); a string column is `rows + 1` offsets (`Q`)
+followed by the UTF-8 bytes of all its values.
+"""
+
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import sys
+from array import array
+from collections import deque
+from datetime import date
+
+from faker import Faker
+
+# ==================================================
+# Configs
+# ==================================================
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+FILE_SUFFIX = ".cols"
+FILE_MAGIC = b"SCOL"
+FILE_VERSION = 1
+DEFAULT_SEED = 42
+ALIGNMENT = 8
+CHUNK_SIZE = 10_000  # rows per chunk in parallel generation
+CHUNKS_PER_WORKER = 2  # chunks generated ahead of the consumer, per worker
+
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_STR = "str"
+TYPECODES = {KIND_INT: "q", KIND_FLOAT: "d"}
+
+# Fixed date ranges: Faker's "age" and "this year" helpers depend on today,
+# which would make a seed generate different data on another day
+BIRTH_DATES = (date(1996, 1, 1), date(2009, 12, 31))
+ENROLLMENT_DATES = (date(1970, 1, 1), date(2024, 12, 31))
+SALE_DATES = (date(2024, 1, 1), date(2024, 12, 31))
+
+# Matches gallery_*/ seeders' `gen_count`
+GALLERY_ARTWORKS = 400
+GALLERY_VISITORS = 200
+
+# ==================================================
+# Dataset Definitions
+# ==================================================
+
+STUDENT_COLUMNS = (
+    ("full_name", KIND_STR),
+    ("date_of_birth", KIND_STR),
+    ("nationality", KIND_STR),
+    ("enrollment_date", KIND_STR),
+    ("mark", KIND_INT),
+    ("comment", KIND_STR),
+)
+
+SALE_COLUMNS = (
+    ("artwork_id", KIND_INT),
+    ("visitor_id", KIND_INT),
+    ("sale_date", KIND_STR),
+    ("amount", KIND_FLOAT),
+)
+
+def _generate_students(fake, rng, count: int):
+    """Yield student rows in `STUDENT_COLUMNS` order."""
+    for _ in range(count):
+        yield (
+            f"{fake.first_name()} {fake.last_name()}",
+            fake.date_between_dates(*BIRTH_DATES).isoformat(),
+            fake.country(),
+            fake.date_between_dates(*ENROLLMENT_DATES).isoformat(),
+            fake.random_int(),
+            fake.sentence(),
+        )
+
+def _generate_sales(fake, rng, count: int, artwork_ids=None, visitor_ids=None):
+    """Yield sale rows in `SALE_COLUMNS` order, referencing the given ids."""
+    artwork_ids = artwork_ids or range(1, GALLERY_ARTWORKS + 1)
+    visitor_ids = visitor_ids or range(1, GALLERY_VISITORS + 1)
+    for _ in range(count):
+        yield (
+            rng.choice(artwork_ids),
+            rng.choice(visitor_ids),
+            fake.date_between_dates(*SALE_DATES).isoformat(),
+            round(rng.uniform(100, 5000), 2),
+        )
+
+DATASETS = {
+    # name: (columns, row generator)
+    "students": (STUDENT_COLUMNS, _generate_students),
+    "sales": (SALE_COLUMNS, _generate_sales),
+}
+
+# ==================================================
+# Writer
+# ==================================================
+
+def _pad(f_cols):
+    """Pad the file to the next `ALIGNMENT` boundary."""
+    f_cols.write(b"\0" * (-f_cols.tell() % ALIGNMENT))
+
+def write_dataset(file_path: str, columns, rows):
+    """Write rows (tuples in `columns` order) as a columnar file. Return the row count."""
+    values = {name: array(TYPECODES[kind]) for name, kind in columns if kind != KIND_STR}
+    offsets = {name: array("Q", [0]) for name, kind in columns if kind == KIND_STR}
+    blobs = {name: bytearray() for name in offsets}
+    count = 0
+    for row in rows:
+        for (name, kind), value in zip(columns, row):
+            if kind == KIND_STR:
+                blobs[name] += value.encode("utf-8")
+                offsets[name].append(len(blobs[name]))
+            else:
+                values[name].append(value)
+        count += 1
+
+    directory = {"rows": count, "columns": []}
+    sections = []
+    for name, kind in columns:
+        if kind == KIND_STR:
+            sections.append(offsets[name].tobytes())
+            sections.append(bytes(blobs[name]))
+        else:
+            sections.append(values[name].tobytes())
+        directory["columns"].append({"name": name, "kind": kind})
+    header = json.dumps(directory).encode("utf-8")
+
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f_cols:
+        f_cols.write(FILE_MAGIC + bytes([FILE_VERSION]) + len(header).to_bytes(4, "little") + header)
+        positions = []
+        for section in sections:
+            _pad(f_cols)
+            positions.append((f_cols.tell(), len(section)))
+            f_cols.write(section)
+        # Section positions go last, so the header did not need them up front
+        _pad(f_cols)
+        footer = array("Q", [value for position in positions for value in position])
+        f_cols.write(footer.tobytes())
+        f_cols.write(len(positions).to_bytes(8, "little"))
+    os.replace(tmp_path, file_path)
+    return count
+
+def generate_dataset(name: str, count: int, seed: int = DEFAULT_SEED, file_path: str = None):
+    """Generate a dataset with a seeded Faker and write it. Return its path."""
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset `{name}`, use one of {tuple(DATASETS)}.")
+    columns, generate = DATASETS[name]
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    file_path = file_path or dataset_path(name, count, seed)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    write_dataset(file_path, columns, generate(fake, rng, count))
+    return file_path
+
+# ==================================================
+# Parallel Generation
+# ==================================================
+
+_worker_fake = None  # one Faker per worker process, re-seeded per chunk
+
+def _generate_chunk(task):
+    """Generate one chunk in a worker process. Return its rows as a list."""
+    global _worker_fake
+    name, count, seed, params = task
+    if _worker_fake is None:
+        _worker_fake = Faker()
+    _worker_fake.seed_instance(seed)
+    _, generate = DATASETS[name]
+    return list(generate(_worker_fake, random.Random(seed), count, **params))
+
+def generate_chunks(
+        name: str,
+        count: int,
+        chunk_size: int = CHUNK_SIZE,
+        seed: int = DEFAULT_SEED,
+        workers: int = None,
+        **params,
+    ):
+    """Yield lists of up to `chunk_size` rows, generated in worker processes.
+
+    Chunk `n` is generated from seed `seed + n`, so the rows depend only on
+    the seed and the chunk size, never on the number of workers. Chunks
+    come back in order and at most `CHUNKS_PER_WORKER` per worker are
+    generated ahead of the caller, so memory does not grow with `count`.
+    `params` go to the row generator, e.g. `artwork_ids` for "sales".
+    """
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset `{name}`, use one of {tuple(DATASETS)}.")
+    tasks = (
+        (name, min(chunk_size, count - start), seed + chunk_no, params)
+        for chunk_no, start in enumerate(range(0, count, chunk_size))
+    )
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        yield from map(_generate_chunk, tasks)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_generate_chunk, (task,)))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+# ==================================================
+# Reader
+# ==================================================
+
+class StrColumn:
+    """Read-only sequence of the strings of one column, decoded on access."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return str(self._blob[start:end], "utf-8")
+
+    def __iter__(self):
+        offsets, blob = self._offsets, self._blob
+        for i in range(len(self)):
+            yield str(blob[offsets[i]:offsets[i + 1]], "utf-8")
+
+class Dataset:
+    """A memory-mapped columnar dataset.
+
+    `column(name)` is a sequence over the mapped bytes: a `memoryview`
+    for numbers, a `StrColumn` for strings. `rows(*names)` yields tuples.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as f_cols:
+            self._mmap = mmap.mmap(f_cols.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._mmap)
+        if bytes(data[:4]) != FILE_MAGIC or data[4] != FILE_VERSION:
+            raise ValueError(f"`{file_path}` is not a dataset file.")
+        header_size = int.from_bytes(data[5:9], "little")
+        directory = json.loads(bytes(data[9:9 + header_size]))
+
+        sections_count = int.from_bytes(data[-8:], "little")
+        footer = data[-8 - sections_count * 16:-8].cast("Q")
+        sections = iter(
+            data[footer[i]:footer[i] + footer[i + 1]] for i in range(0, len(footer), 2)
+        )
+        self.count = directory["rows"]
+        self._columns = {}
+        for column in directory["columns"]:
+            if column["kind"] == KIND_STR:
+                self._columns[column["name"]] = StrColumn(next(sections).cast("Q"), next(sections))
+            else:
+                self._columns[column["name"]] = next(sections).cast(TYPECODES[column["kind"]])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def columns(self):
+        """Column names, in file order."""
+        return list(self._columns)
+
+    def column(self, name: str):
+        """Sequence of one column's values."""
+        return self._columns[name]
+
+    def rows(self, *names: str, start: int = 0, stop: int = None):
+        """Yield tuples of the `names` columns (all by default) for rows [start, stop)."""
+        columns = [self._columns[name] for name in (names or self._columns)]
+        for i in range(start, self.count if stop is None else min(stop, self.count)):
+            yield tuple(column[i] for column in columns)
+
+    def close(self):
+        """Release the mapping. Columns read from it must not be used afterwards."""
+        self._columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # A caller still holds a view; the mapping goes with it
+
+def dataset_path(name: str, count: int, seed: int = DEFAULT_SEED, cache_dir: str = CACHE_DIR):
+    """Cache file of a dataset."""
+    return os.path.join(cache_dir, f"{name}-{count}-{seed}{FILE_SUFFIX}")
+
+def load_dataset(name: str, count: int, seed: int = DEFAULT_SEED, cache_dir: str = CACHE_DIR):
+    """Memory-map a cached dataset, generating it first if it is not cached yet."""
+    file_path = dataset_path(name, count, seed, cache_dir)
+    if not os.path.exists(file_path):
+        generate_dataset(name, count, seed, file_path)
+    return Dataset(file_path)
+
+if __name__ == "__main__":
+    import time
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    dataset_name, rows_count = sys.argv[1], int(sys.argv[2])
+    dataset_seed = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_SEED
+
+    g_start = time.time()
+    path = generate_dataset(dataset_name, rows_count, dataset_seed)
+    print(f"generated {rows_count} {dataset_name} in {time.time() - g_start:.3f} s: {path} ({os.path.getsize(path)} bytes)")
+    l_start = time.time()
+    with Dataset(path) as dataset:
+        scanned = sum(1 for _ in dataset.rows())
+    print(f"mapped and read {scanned} rows in {time.time() - l_start:.3f} s")
@@ -3,84 +3,125 @@
 import os
 import time
 
+from day_7_file_db.compaction import Compactor
+from day_7_file_db.record_cache import make_cache, POLICY_ARC
+from day_7_file_db.write_ahead_log import LoggedFile
+
 FILE_PATH = "students_db.txt"
 SEPARATOR = ";"
+# Appends are logged to FILE_PATH + ".wal" first. Without fsync the WAL
+# survives a killed process; set True to also survive power loss.
+WAL_FSYNC = False
+
+# Log-structured storage: records are only ever appended to FILE_PATH and
+# `offset_index` maps every full_name to the byte offset of its latest record.
+offset_index = {}
+
+# Recently read students, invalidated whenever a new version is appended.
+CACHE_POLICY = POLICY_ARC  # `lru` or `arc`
+CACHE_MAX_BYTES = 1 << 20
+student_cache = make_cache(
+    CACHE_POLICY,
+    CACHE_MAX_BYTES,
+    size_of=lambda key, student: len(key) + len(student['comment']) + 32,
+)
 
 def _delete_db():
     """Delete db file."""
+    offset_index.clear()
+    student_cache.clear()
     if os.path.exists(FILE_PATH):
-        os.remove(FILE_PATH)
+        logged_file.reset()
         print(f"{FILE_PATH} has been deleted.")
     else:
         print(f"{FILE_PATH} does not exist.")
 
-def _read_records():
-    """Read all records from the file."""
-    if not os.path.exists(FILE_PATH):
-        return []
-    with open(FILE_PATH, "r", encoding="utf-8") as file:
-        return file.readlines()
-
-def _write_records(records):
-    """Write all records to the file."""
-    with open(FILE_PATH, "w", encoding="utf-8") as file:
-        file.writelines(records)
-
-def create_student(full_name, start_date, average_grade, comment):
-    """Add a new student record to the database."""
-    records = _read_records()
+def _format_record(full_name, start_date, average_grade, comment):
+    """Format a `key_size;rest_size;key;data` record line."""
     key_size = len(full_name)
     data = f"{start_date}{SEPARATOR}{average_grade}{SEPARATOR}{comment}"
     rest_size = len(data)
-    record = f"{key_size}{SEPARATOR}{rest_size}{SEPARATOR}{full_name}{SEPARATOR}{data}\n"
+    return f"{key_size}{SEPARATOR}{rest_size}{SEPARATOR}{full_name}{SEPARATOR}{data}\n"
 
-    for rec in records:
-        if rec.startswith(f"{key_size}{SEPARATOR}{full_name}{SEPARATOR}"):
-            raise ValueError("Student already exists.")
+def _parse_record(line):
+    """Split a record line into (key, data) using its key_size prefix."""
+    key_size, _, rest = line.split(SEPARATOR, 2)
+    key_size = int(key_size)
+    return rest[:key_size], rest[key_size + 1:].rstrip("\n")
 
-    records.append(record)
-    _write_records(records)
+def _build_index():
+    """Replay the log once to rebuild the in-memory offset index."""
+    offset_index.clear()
+    if not os.path.exists(FILE_PATH):
+        return
+    with open(FILE_PATH, "rb") as file:
+        offset = 0
+        for line in file:
+            try:
+                key, _ = _parse_record(line.decode("utf-8"))
+                offset_index[key] = offset
+            except ValueError:
+                pass  # Skip malformed lines
+            offset += len(line)
+
+def _swap_index(new_index):
+    """Point the offset index at a freshly compacted log."""
+    offset_index.clear()
+    offset_index.update(new_index)
+    logged_file.reopen()
+
+compactor = Compactor(FILE_PATH, SEPARATOR, on_swap=_swap_index)
+# Recovers a torn tail from the WAL before the index is built
+logged_file = LoggedFile(FILE_PATH, lock=compactor.lock, sync=WAL_FSYNC)
+
+def _append_record(record):
+    """Log the record, append it to the end of the log and return its byte offset."""
+    return logged_file.append(record.encode("utf-8"))
 
-def read_student(full_name):
-    """Retrieve the most recent record for a student."""
-    records = _read_records()
-    key_size = len(full_name)
+def create_student(full_name, start_date, average_grade, comment):
+    """Add a new student record to the database."""
+    if full_name in offset_index:
+        raise ValueError("Student already exists.")
 
-    for rec in reversed(records):
-        parts = rec.split(SEPARATOR)
-        if len(parts) < 4:
-            continue
-        if int(parts[0]) == key_size and parts[2] == full_name:
-            return {
-                'full_name': full_name,
-                'start_date': parts[3],
-                'average_grade': float(parts[4]),
-                'comment': SEPARATOR.join(parts[5:]).strip()
-            }
+    record = _format_record(full_name, start_date, average_grade, comment)
+    offset_index[full_name] = _append_record(record)
+    student_cache.invalidate(full_name)
 
-    raise ValueError("Student not found.")
+def read_student(full_name):
+    """Retrieve the most recent record for a student."""
+    offset = offset_index.get(full_name)
+    if offset is None:
+        raise ValueError("Student not found.")
+
+    student = student_cache.get(full_name)
+    if student is not None:
+        return dict(student)
+
+    with open(FILE_PATH, "rb") as file:
+        file.seek(offset)
+        _, data = _parse_record(file.readline().decode("utf-8"))
+
+    start_date, average_grade, comment = data.split(SEPARATOR, 2)
+    student = {
+        'full_name': full_name,
+        'start_date': start_date,
+        'average_grade': float(average_grade),
+        'comment': comment.strip()
+    }
+    student_cache.put(full_name, student)
+    return dict(student)
 
 def update_student(full_name, start_date, average_grade, comment):
-    """Update or add a new student record."""
-    records = _read_records()
-    key_size = len(full_name)
-    data = f"{start_date}{SEPARATOR}{average_grade}{SEPARATOR}{comment}"
-    rest_size = len(data)
-    record = f"{key_size}{SEPARATOR}{rest_size}{SEPARATOR}{full_name}{SEPARATOR}{data}\n"
-
-    updated = False
-    new_records = []
-    for rec in records:
-        if rec.startswith(f"{key_size}{SEPARATOR}{full_name}{SEPARATOR}"):
-            updated = True
-            new_records.append(record)
-        else:
-            new_records.append(rec)
+    """Update or add a new student record.
 
-    if not updated:
-        new_records.append(record)
+    The new version is appended to the log and the index is pointed at it,
+    older versions stay in the file until it is compacted.
+    """
+    record = _format_record(full_name, start_date, average_grade, comment)
+    offset_index[full_name] = _append_record(record)
+    student_cache.invalidate(full_name)
 
-    _write_records(new_records)
+_build_index()
 
 # ===========================~~~===============================
 
@@ -105,7 +146,7 @@ def create_operation(repeat):
     _delete_db()
     print(f"create_operation_repeat: {repeat}")
     for i in range(repeat):
-        create_student("Full Name","2022-07-30", 92.3, f"Comment {i}")
+        create_student(f"Full Name {i}","2022-07-30", 92.3, f"Comment {i}")
 
 print("\nCREATE")
 measure_perf(create_operation)
@@ -116,10 +157,11 @@ def read_operation(repeat):
     """Create Operation Measurement"""
     print(f"create_operation_repeat: {repeat}")
     for i in range(repeat):
-        read_student("Full Name")
+        read_student("Full Name 0")
 
 print("\nREAD")
 measure_perf(read_operation)
+print(f"{CACHE_POLICY} cache hit rate: {student_cache.hit_rate():.2%} {student_cache.stats}")
 
 # ===========================~~~===============================
 
@@ -134,3 +176,9 @@ print("\nUPDATE")
 measure_perf(update_operation)
 
 # ===========================~~~===============================
+
+print("\nCOMPACT")
+compactor.compact()
+compactor.print_metrics()
+
+# ===========================~~~===============================
@@ -1,10 +1,13 @@
 """SQLite Performance"""
 
-import sqlite3
 import time
 
+from sqlite_perf.insert_strategies import insert_rows, measure_insert_strategies
+from sqlite_perf.sqlite_profiles import connect, PROFILE_DEFAULT
+
 # Init Database
-db = sqlite3.connect("perf_measure.db")
+PRAGMA_PROFILE = PROFILE_DEFAULT  # one of `PROFILES`; see `sqlite_perf.py --sweep`
+db = connect("perf_measure.db", PRAGMA_PROFILE)
 cursor = db.cursor()
 
 # ===========================~~~===============================
@@ -26,14 +29,20 @@ def migrate():
 # ===========================~~~===============================
 
 # Operations
+INSERT_SQL = """
+    INSERT INTO students (full_name, start_date, average_grade, comment) VALUES (?,?,?,?)
+"""
+STUDENT = ("Alex Roy", "2024-06-30", 90, "Comment")
+CREATE_STRATEGY = "execute"  # one of `INSERT_STRATEGIES`
+CREATE_BATCH_SIZE = 1_000
+
 def create_student():
     """Create a student"""
-    cursor.execute(
-        """
-            INSERT INTO students (full_name, start_date, average_grade, comment) VALUES (?,?,?,?)
-        """,
-        ("Alex Roy", "2024-06-30", 90, "Comment")
-    )
+    cursor.execute(INSERT_SQL, STUDENT)
+
+def create_students(count, strategy = CREATE_STRATEGY, batch_size = CREATE_BATCH_SIZE):
+    """Create `count` students with one of the insert strategies"""
+    insert_rows(db, INSERT_SQL, (STUDENT for _ in range(count)), strategy, batch_size)
 
 def read_student():
     """Update a student"""
@@ -72,12 +81,14 @@ def create_operation(repeat):
     """Measure SQLite insert operation."""
     migrate()
     print(f"create_operation_repeat: {repeat}")
-    for _ in range(repeat):
-        create_student()
+    create_students(repeat)
 
 print("\nCREATE")
 measure_perf(create_operation)
 
+print("\nCREATE STRATEGIES")
+measure_insert_strategies(db, INSERT_SQL, [STUDENT] * perf_repeat[-1], migrate, batch_sizes=(100, CREATE_BATCH_SIZE))
+
 # ===========================~~~===============================
 
 def read_operation(repeat):
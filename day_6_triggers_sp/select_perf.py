@@ -1,9 +1,13 @@
 """Select Performance between SQLite and Postgres"""
 
+import os
+import sys
 import time
-import sqlite3
 import psycopg2
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sqlite_perf.sqlite_profiles import connect, PROFILE_DEFAULT
+
 # Configs
 postgres_config = {
     "host": "localhost",
@@ -13,6 +17,7 @@ postgres_config = {
     "dbname": "postgres"
 }
 sqlite_db = "gallery.db"
+sqlite_profile = PROFILE_DEFAULT  # other profiles rewrite the tracked gallery.db header
 
 # Queries
 queries = {
@@ -143,7 +148,7 @@ def test_postgres_queries():
 def test_sqlite_queries():
     """SQLite Performance"""
     print("\nSQLite Performance:\n")
-    conn = sqlite3.connect(sqlite_db)
+    conn = connect(sqlite_db, sqlite_profile)
 
     # Get row by primary key
     primary_key_query_time, _ = measure_query_performance(conn, queries["get_by_primary_key_sqlite"], (1,))
@@ -0,0 +1,210 @@
+"""Asyncio front-end for the file DB with request coalescing"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from concurrent_db import FileDB
+
+# ==================================================
+# Configs
+# ==================================================
+
+FILE_PATH = "async_db.txt"
+COALESCE_WINDOW_MS = 1.0  # how long the first request of a batch waits for company
+MAX_BATCH_SIZE = 1_000  # a full batch is sent without waiting for the window
+DISK_WORKERS = 2
+
+# ==================================================
+# Coalescing Batcher
+# ==================================================
+
+class _Batcher:
+    """Collect items for up to `window_ms`, then hand them to `run_batch` at once.
+
+    When no batch is running the first item goes out immediately, so a
+    lone client does not pay the window; items arriving while a batch is
+    running wait for it to finish or for the window, whichever is first.
+    `run_batch(items)` runs in the executor and returns one result per
+    item, in order.
+    """
+
+    def __init__(self, run_batch, executor, window_ms: float, max_batch_size: int):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.metrics = {"requests": 0, "batches": 0}
+        self._items = []
+        self._futures = []
+        self._timer = None
+        self._running = 0
+
+    def submit(self, item):
+        """Queue an item and return a future for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        self.metrics["requests"] += 1
+        if len(self._items) >= self.max_batch_size or self.window <= 0 or not self._running:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return future
+
+    def _dispatch(self):
+        """Send the collected items to the executor as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._items:
+            return
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        self.metrics["batches"] += 1
+        self._running += 1
+        task = asyncio.get_running_loop().run_in_executor(self.executor, self.run_batch, items)
+        task.add_done_callback(lambda done: self._resolve(done, futures))
+
+    def _resolve(self, done, futures):
+        """Hand each waiting request its result, or the batch's exception.
+
+        A cancelled batch cancels its waiting requests; `exception()`
+        would raise CancelledError here instead of returning.
+        """
+        self._running -= 1
+        if self._items and not self._running:
+            self._dispatch()  # Requests that queued up behind this batch
+        if done.cancelled():
+            for future in futures:
+                future.cancel()
+            return
+        if done.exception() is not None:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(done.exception())
+            return
+        for future, result in zip(futures, done.result()):
+            if not future.done():
+                future.set_result(result)
+
+# ==================================================
+# Async File DB
+# ==================================================
+
+class AsyncFileDB:
+    """`await db.get(name)` / `await db.put(...)` over a blocking `FileDB`.
+
+    Requests arriving within `window_ms` of each other are coalesced:
+    gets become one `select_students_hash` call (duplicate names are read
+    once) and puts one batch of queued inserts sharing one flush. All
+    disk work runs on a dedicated executor, never on the event loop.
+    """
+
+    def __init__(
+            self,
+            db: FileDB,
+            window_ms: float = COALESCE_WINDOW_MS,
+            max_batch_size: int = MAX_BATCH_SIZE,
+            disk_workers: int = DISK_WORKERS,
+        ):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=disk_workers, thread_name_prefix="disk")
+        self._gets = _Batcher(self._read_batch, self.executor, window_ms, max_batch_size)
+        self._puts = _Batcher(self._write_batch, self.executor, window_ms, max_batch_size)
+
+    @property
+    def metrics(self):
+        """Requests and batches per operation."""
+        return {"get": dict(self._gets.metrics), "put": dict(self._puts.metrics)}
+
+    def _read_batch(self, names):
+        """Read a batch of gets in one pass over the file."""
+        records = self.db.select_students_hash(set(names))
+        return [records[name] for name in names]
+
+    def _write_batch(self, students):
+        """Queue a batch of puts and wait until they are visible."""
+        futures = [self.db.insert(*student) for student in students]
+        return [future.result() for future in futures]
+
+    async def get(self, full_name: str):
+        """Return the student record, or None."""
+        return await self._gets.submit(full_name)
+
+    async def put(self, full_name: str, enrollment_date: str, mark: int, comment: str):
+        """Insert a student. Return its offset, or None if it already exists."""
+        return await self._puts.submit((full_name, enrollment_date, mark, comment))
+
+    def close(self):
+        """Stop the executor. The wrapped `FileDB` is left open."""
+        self.executor.shutdown(wait=True)
+
+# ==================================================
+# Load Generator
+# ==================================================
+
+def _percentile(sorted_values, percent: float):
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+async def run_load(db: AsyncFileDB, names, concurrency: int, requests_count: int, put_every: int = 10):
+    """Run `concurrency` clients issuing gets (and a put every `put_every`) and time each."""
+    latencies = []
+    per_client = requests_count // concurrency
+
+    async def client(client_id: int):
+        for i in range(per_client):
+            start = time.perf_counter()
+            if i % put_every == put_every - 1:
+                await db.put(f"Load Client {client_id} {i}", "2022-07-30", i, "load generator")
+            else:
+                await db.get(names[(client_id * 7919 + i) % len(names)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(client_id) for client_id in range(concurrency)))
+    time_taken = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / time_taken, _percentile(latencies, 50), _percentile(latencies, 99)
+
+if __name__ == "__main__":
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from bench_datasets.dataset_cache import load_dataset
+
+    RECORDS_COUNT = 20_000
+    REQUESTS_COUNT = 20_000
+    CONCURRENCY_LEVELS = [1, 10, 100, 1_000]
+    WINDOWS_MS = [0.0, COALESCE_WINDOW_MS]
+
+    if os.path.exists(FILE_PATH):
+        os.remove(FILE_PATH)
+    file_db = FileDB(FILE_PATH)
+    with load_dataset("students", RECORDS_COUNT) as dataset:
+        students = list(dataset.rows("full_name", "enrollment_date", "mark", "comment"))
+    names = [student[0] for student in students]
+    for future in [file_db.insert(*student) for student in students]:
+        future.result()
+
+    print(f"Async File DB ({REQUESTS_COUNT} requests, 1 put per 10):")
+    for window_ms in WINDOWS_MS:
+        for concurrency in CONCURRENCY_LEVELS:
+            async_db = AsyncFileDB(file_db, window_ms=window_ms)
+            throughput, p50, p99 = asyncio.run(run_load(async_db, names, concurrency, REQUESTS_COUNT))
+            metrics = async_db.metrics
+            async_db.close()
+            print(
+                f"window: {window_ms} ms\tconcurrency: {concurrency}\treq/s: {int(throughput)}"
+                f"\tp50: {p50 * 1000:.3f} ms\tp99: {p99 * 1000:.3f} ms"
+                f"\tget batches: {metrics['get']['batches']}\tput batches: {metrics['put']['batches']}"
+            )
+
+    file_db.close()
+    os.remove(FILE_PATH)
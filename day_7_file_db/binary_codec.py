@@ -0,0 +1,360 @@
+"""Binary record format for the file DB"""
+
+import os
+import struct
+import time
+import zlib
+
+# ==================================================
+# Configs
+# ==================================================
+
+SEPARATOR = ";"
+FILE_MAGIC = b"SDBB"
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct("<4sB")  # magic, format version
+BINARY_HEADER = FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION)
+
+# crc32, version, flags, mark type, key length, value length, date length
+RECORD_HEADER = struct.Struct("<IBBBHIB")
+CRC_SIZE = 4
+
+FLAG_TOMBSTONE = 0x01
+
+MARK_INT = 1
+MARK_FLOAT = 2
+MARK_STRUCTS = {
+    MARK_INT: struct.Struct("<q"),
+    MARK_FLOAT: struct.Struct("<d"),
+}
+MARK_SIZE = 8
+
+FORMAT_TEXT = "text"  # `key_size;data_size;key;data` lines
+FORMAT_BINARY = "binary"  # this module's records
+FORMATS = (FORMAT_TEXT, FORMAT_BINARY)
+
+class CorruptRecordError(ValueError):
+    """Raised when a record is truncated or fails its CRC check."""
+
+class TruncatedRecordError(CorruptRecordError):
+    """Raised when a record runs past the end of the data, e.g. a torn last write."""
+
+# ==================================================
+# Record Codec
+# ==================================================
+
+def encode_record(
+        full_name: str,
+        enrollment_date: str = "",
+        mark=0,
+        comment: str = "",
+        tombstone: bool = False,
+    ):
+    """Pack one record: fixed header, then mark, key, date and comment."""
+    key = full_name.encode("utf-8")
+    date = enrollment_date.encode("utf-8")
+    text = comment.encode("utf-8")
+    mark_type = MARK_FLOAT if isinstance(mark, float) else MARK_INT
+    value = MARK_STRUCTS[mark_type].pack(mark) + date + text
+    flags = FLAG_TOMBSTONE if tombstone else 0
+
+    header = RECORD_HEADER.pack(
+        0, FORMAT_VERSION, flags, mark_type, len(key), len(value), len(date)
+    )
+    body = header[CRC_SIZE:] + key + value
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+def decode_record(buffer, offset: int = 0):
+    """Unpack the record at `offset`. Return (record, next_offset)."""
+    if offset + RECORD_HEADER.size > len(buffer):
+        raise TruncatedRecordError(f"Truncated header at {offset}.")
+    crc, version, flags, mark_type, key_len, value_len, date_len = (
+        RECORD_HEADER.unpack_from(buffer, offset)
+    )
+    key_start = offset + RECORD_HEADER.size
+    value_start = key_start + key_len
+    end = value_start + value_len
+    if end > len(buffer):
+        raise TruncatedRecordError(f"Truncated record at {offset}.")
+    if zlib.crc32(buffer[offset + CRC_SIZE:end]) != crc:
+        raise CorruptRecordError(f"CRC mismatch at {offset}.")
+    if version != FORMAT_VERSION or mark_type not in MARK_STRUCTS:
+        raise CorruptRecordError(f"Unknown record version or mark type at {offset}.")
+
+    (mark,) = MARK_STRUCTS[mark_type].unpack_from(buffer, value_start)
+    date_start = value_start + MARK_SIZE
+    record = {
+        "full_name": str(buffer[key_start:value_start], "utf-8"),
+        "enrollment_date": str(buffer[date_start:date_start + date_len], "utf-8"),
+        "mark": mark,
+        "comment": str(buffer[date_start + date_len:end], "utf-8"),
+        "tombstone": bool(flags & FLAG_TOMBSTONE),
+    }
+    return record, end
+
+# ==================================================
+# Binary Files
+# ==================================================
+
+def detect_format(file_path: str):
+    """Return FORMAT_BINARY if the file starts with the magic header, else FORMAT_TEXT."""
+    if not os.path.exists(file_path):
+        return FORMAT_TEXT
+    with open(file_path, "rb") as f_db:
+        magic = f_db.read(len(FILE_MAGIC))
+    return FORMAT_BINARY if magic == FILE_MAGIC else FORMAT_TEXT
+
+def create_binary_file(file_path: str):
+    """Create an empty binary database file."""
+    with open(file_path, "wb") as f_db:
+        f_db.write(BINARY_HEADER)
+
+def append_binary_record(file_path: str, *args, **kwargs):
+    """Append a record to a binary file and return its byte offset."""
+    if not os.path.exists(file_path):
+        create_binary_file(file_path)
+    with open(file_path, "ab") as f_db:
+        position = f_db.tell()
+        f_db.write(encode_record(*args, **kwargs))
+    return position
+
+def _is_torn_tail(buffer, offset: int):
+    """True if the bad record at `offset` is the last thing in `buffer`.
+
+    A crash mid-append leaves a truncated record, or one whose bytes
+    never fully reached the disk, at the very end; anything after a bad
+    record means the file was damaged, not torn.
+    """
+    try:
+        decode_record(buffer, offset)
+    except TruncatedRecordError:
+        return True
+    except CorruptRecordError:
+        *_, key_len, value_len, _ = RECORD_HEADER.unpack_from(buffer, offset)
+        return offset + RECORD_HEADER.size + key_len + value_len >= len(buffer)
+    return False
+
+def _iter_binary(file_path: str):
+    """Yield (offset, record) from a binary file.
+
+    Stop at a torn last record (see `recover`); raise CorruptRecordError
+    for a bad record in the middle of the file instead of dropping every
+    record after it.
+    """
+    with open(file_path, "rb") as f_db:
+        buffer = f_db.read()
+    magic, version = FILE_HEADER.unpack_from(buffer)
+    if magic != FILE_MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"`{file_path}` is not a version {FORMAT_VERSION} binary file DB.")
+    offset = FILE_HEADER.size
+    while offset < len(buffer):
+        try:
+            record, next_offset = decode_record(buffer, offset)
+        except CorruptRecordError:
+            if _is_torn_tail(buffer, offset):
+                return
+            raise
+        yield offset, record
+        offset = next_offset
+
+def recover(file_path: str):
+    """Truncate a torn last record from a binary file. Return bytes dropped.
+
+    Raise CorruptRecordError, leaving the file alone, if a bad record has
+    valid-looking data after it: truncating there would lose good records.
+    """
+    with open(file_path, "rb") as f_db:
+        buffer = f_db.read()
+    valid_end = FILE_HEADER.size
+    while valid_end < len(buffer):
+        try:
+            _, valid_end = decode_record(buffer, valid_end)
+        except CorruptRecordError:
+            if not _is_torn_tail(buffer, valid_end):
+                raise
+            break
+    dropped = len(buffer) - valid_end
+    if dropped:
+        with open(file_path, "r+b") as f_db:
+            f_db.truncate(valid_end)
+    return dropped
+
+# ==================================================
+# Record Lines
+# ==================================================
+
+def record_to_line(record: dict, separator: str = SEPARATOR):
+    """Format a decoded record as a `key_size;data_size;key;data` line."""
+    key = record["full_name"]
+    data = "" if record["tombstone"] else (
+        f"{record['enrollment_date']}{separator}{record['mark']}{separator}{record['comment']}"
+    )
+    return f"{len(key)}{separator}{len(data)}{separator}{key}{separator}{data}"
+
+def encode_line(line: str, separator: str = SEPARATOR):
+    """Encode a `key_size;data_size;key;data` line as a binary record."""
+    key_size, data_size, rest = line.rstrip("\n").split(separator, 2)
+    key = rest[:int(key_size)]
+    if int(data_size) == 0:
+        return encode_record(key, tombstone=True)
+    date, mark, comment = rest[int(key_size) + 1:].split(separator, 2)
+    return encode_record(key, date, _parse_mark(mark), comment)
+
+def read_raw_record(f_db):
+    """Read the raw bytes of the record at the current position, b"" at EOF.
+
+    A torn record at the end is returned short; `decode_record` rejects it.
+    """
+    header = f_db.read(RECORD_HEADER.size)
+    if len(header) < RECORD_HEADER.size:
+        return header
+    *_, key_len, value_len, _ = RECORD_HEADER.unpack(header)
+    return header + f_db.read(key_len + value_len)
+
+def parse_raw_key(raw: bytes):
+    """Return (key, is_tombstone) of a raw record, or None for a torn last one.
+
+    A CRC failure raises, so compaction never drops a damaged record.
+    """
+    try:
+        record, _ = decode_record(raw)
+    except TruncatedRecordError:
+        return None
+    return record["full_name"], record["tombstone"]
+
+def read_line_at(f_db, offset: int, separator: str = SEPARATOR):
+    """Read the binary record at `offset` of an open file as a text line."""
+    f_db.seek(offset)
+    record, _ = decode_record(read_raw_record(f_db))
+    return record_to_line(record, separator)
+
+def scan_binary_records(
+        file_path: str,
+        predicate=None,
+        start_offset: int = 0,
+        separator: str = SEPARATOR,
+    ):
+    """Lazily yield (offset, key, data) from a binary file, like `scan_records`.
+
+    `data` is the text `date;mark;comment`, "" for a tombstone. A torn
+    last record ends the scan; a bad record mid-file raises.
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "rb") as f_db:
+        file_size = f_db.seek(0, os.SEEK_END)
+        offset = max(start_offset, FILE_HEADER.size)
+        f_db.seek(offset)
+        while offset < file_size:
+            raw = read_raw_record(f_db)
+            try:
+                record, _ = decode_record(raw)
+            except TruncatedRecordError:
+                return
+            except CorruptRecordError as exc:
+                if offset + len(raw) >= file_size:
+                    return
+                raise CorruptRecordError(f"Bad record at byte {offset} of `{file_path}`.") from exc
+            line = record_to_line(record, separator)
+            key = record["full_name"]
+            found = (offset, key, line.split(separator, 2)[2][len(key) + 1:])
+            offset += len(raw)
+            if predicate is None or predicate(found):
+                yield found
+
+def open_data_file(file_path: str, file_format: str = FORMAT_TEXT):
+    """Make sure a data file exists in `file_format`. Return bytes dropped by recovery.
+
+    A new binary file gets the header. An existing one is `recover`ed
+    before any writer or index touches it: appending after a torn last
+    record would bury it mid-file, where it makes every later scan raise.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown file format `{file_format}`, use one of {FORMATS}.")
+    if file_format != FORMAT_BINARY:
+        return 0
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        create_binary_file(file_path)
+        return 0
+    if detect_format(file_path) != FORMAT_BINARY:
+        raise ValueError(f"`{file_path}` is not a binary file DB, convert it with `convert_text_file`.")
+    return recover(file_path)
+
+# ==================================================
+# Text Files
+# ==================================================
+
+def _parse_mark(raw: str):
+    """Keep integer marks as int and grades like `92.3` as float."""
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+def _iter_text(file_path: str, separator: str = SEPARATOR):
+    """Yield (offset, record) from a `key_size;data_size;key;data` text file."""
+    with open(file_path, "rb") as f_db:
+        offset = 0
+        for raw_line in f_db:
+            line = raw_line.decode("utf-8").rstrip("\n")
+            key_size, data_size, rest = line.split(separator, 2)
+            key = rest[:int(key_size)]
+            if int(data_size) == 0:
+                record = {"full_name": key, "enrollment_date": "", "mark": 0,
+                          "comment": "", "tombstone": True}
+            else:
+                date, mark, comment = rest[int(key_size) + 1:].split(separator, 2)
+                record = {"full_name": key, "enrollment_date": date,
+                          "mark": _parse_mark(mark), "comment": comment, "tombstone": False}
+            yield offset, record
+            offset += len(raw_line)
+
+def read_records(file_path: str):
+    """Yield (offset, record) from a file DB in whichever format it uses."""
+    if not os.path.exists(file_path):
+        return iter(())
+    if detect_format(file_path) == FORMAT_BINARY:
+        return _iter_binary(file_path)
+    return _iter_text(file_path)
+
+def convert_text_file(src_path: str, dst_path: str):
+    """Convert a text file DB to the binary format. Return the record count."""
+    count = 0
+    with open(dst_path, "wb") as f_dst:
+        f_dst.write(BINARY_HEADER)
+        for _, record in _iter_text(src_path):
+            f_dst.write(encode_record(
+                record["full_name"],
+                record["enrollment_date"],
+                record["mark"],
+                record["comment"],
+                record["tombstone"],
+            ))
+            count += 1
+    return count
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as bench_dir:
+        for text_path in ("file_db.txt", "hashed_db.txt", "sorted_db.txt"):
+            binary_path = os.path.join(bench_dir, text_path.replace(".txt", ".bin"))
+            records_count = convert_text_file(text_path, binary_path)
+
+            t_start = time.time()
+            for _ in read_records(text_path):
+                pass
+            text_time = round(time.time() - t_start, 6)
+
+            b_start = time.time()
+            for _ in read_records(binary_path):
+                pass
+            binary_time = round(time.time() - b_start, 6)
+
+            print(f"{text_path}: {records_count} records")
+            print(f"text parse time: {text_time:.6f} s ({os.path.getsize(text_path)} bytes)")
+            print(f"binary parse time: {binary_time:.6f} s ({os.path.getsize(binary_path)} bytes)")
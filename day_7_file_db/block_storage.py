@@ -0,0 +1,238 @@
+"""Compressed block storage for student record files"""
+
+import bisect
+import lzma
+import os
+import struct
+import time
+import zlib
+
+# ==================================================
+# Configs
+# ==================================================
+
+SEPARATOR = ";"
+BLOCK_SIZE = 64 * 1024  # uncompressed bytes per block
+FILE_MAGIC = b"SDBZ"
+FILE_HEADER = struct.Struct("<4sB")  # magic, codec id
+BLOCK_HEADER = struct.Struct("<I")  # compressed length
+INDEX_ENTRY = struct.Struct("<QIH")  # block offset, compressed length, first key length
+FOOTER = struct.Struct("<QI4s")  # index offset, blocks count, magic
+
+CODEC_ZLIB = "zlib"
+CODEC_LZMA = "lzma"
+CODECS = {
+    # name: (id, compress, decompress)
+    CODEC_ZLIB: (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    CODEC_LZMA: (2, lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+CODEC_NAMES = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+
+# ==================================================
+# Helper Functions
+# ==================================================
+
+def _record_key(line: bytes):
+    """UTF-8 key of a raw `key_size;data_size;key;data` line.
+
+    `key_size` counts characters, not bytes, so the key is sliced after
+    decoding; UTF-8 bytes sort like the characters, so the result is
+    used as is for sorting, the first-key index and lookups.
+    """
+    key_size, _, rest = line.split(SEPARATOR.encode("utf-8"), 2)
+    return rest.decode("utf-8")[:int(key_size)].encode("utf-8")
+
+# ==================================================
+# Writer
+# ==================================================
+
+def write_block_file(lines, file_path: str, codec: str = CODEC_ZLIB, block_size: int = BLOCK_SIZE):
+    """Write raw record lines, already in key order, as compressed blocks.
+
+    Lines are grouped into blocks of about `block_size` bytes; the block
+    index (first key, offset, length of each block) and a footer pointing
+    at it go at the end of the file. Return the number of blocks.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec `{codec}`, use one of {tuple(CODECS)}.")
+    codec_id, compress, _ = CODECS[codec]
+    index = []
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f_blocks:
+        f_blocks.write(FILE_HEADER.pack(FILE_MAGIC, codec_id))
+        block, block_bytes = [], 0
+
+        def flush_block():
+            payload = compress(b"".join(block))
+            index.append((_record_key(block[0]), f_blocks.tell(), len(payload)))
+            f_blocks.write(BLOCK_HEADER.pack(len(payload)) + payload)
+
+        for line in lines:
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            block.append(line)
+            block_bytes += len(line)
+            if block_bytes >= block_size:
+                flush_block()
+                block, block_bytes = [], 0
+        if block:
+            flush_block()
+
+        index_offset = f_blocks.tell()
+        for first_key, offset, length in index:
+            f_blocks.write(INDEX_ENTRY.pack(offset, length, len(first_key)) + first_key)
+        f_blocks.write(FOOTER.pack(index_offset, len(index), FILE_MAGIC))
+    os.replace(tmp_path, file_path)
+    return len(index)
+
+def convert_text_file(src_path: str, dst_path: str, codec: str = CODEC_ZLIB, block_size: int = BLOCK_SIZE):
+    """Write every record of a text file into a block file, in key order.
+
+    The sort is stable, so versions of a key keep their log order and the
+    last one is still the latest.
+    """
+    with open(src_path, "rb") as f_src:
+        lines = [line for line in f_src if line.strip()]
+    lines.sort(key=_record_key)
+    return write_block_file(lines, dst_path, codec, block_size)
+
+# ==================================================
+# Reader
+# ==================================================
+
+class BlockFileReader:
+    """Read a block file: point reads decompress one block, scans stream them all."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.metrics = {"blocks_read": 0, "bytes_read": 0}
+        self._file = open(file_path, "rb")
+        magic, codec_id = FILE_HEADER.unpack(self._file.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC or codec_id not in CODEC_NAMES:
+            raise ValueError(f"`{file_path}` is not a block file.")
+        self.codec = CODEC_NAMES[codec_id]
+        self._decompress = CODECS[self.codec][2]
+
+        self._file.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, blocks_count, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+        if magic != FILE_MAGIC:
+            raise ValueError(f"`{file_path}` has no block index, it may be truncated.")
+        self._file.seek(index_offset)
+        data = self._file.read()
+        self.first_keys, self.blocks = [], []
+        pos = 0
+        for _ in range(blocks_count):
+            offset, length, key_length = INDEX_ENTRY.unpack_from(data, pos)
+            pos += INDEX_ENTRY.size
+            self.first_keys.append(data[pos:pos + key_length])
+            self.blocks.append((offset, length))
+            pos += key_length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_block(self, block_no: int):
+        """Decompress one block into its raw lines."""
+        offset, length = self.blocks[block_no]
+        self._file.seek(offset + BLOCK_HEADER.size)
+        payload = self._file.read(length)
+        self.metrics["blocks_read"] += 1
+        self.metrics["bytes_read"] += length
+        # Split on b"\n" only: `splitlines` would also split on a \r inside a
+        # comment. Every line ends with b"\n", so the last item is empty.
+        return self._decompress(payload).split(b"\n")[:-1]
+
+    def get(self, full_name: str):
+        """Return the latest record line for `full_name`, or None.
+
+        The latest version lives in the last block whose first key is
+        <= `full_name`, so exactly one block is read.
+        """
+        key = full_name.encode("utf-8")
+        block_no = bisect.bisect_right(self.first_keys, key) - 1
+        if block_no < 0:
+            return None
+        for line in reversed(self.read_block(block_no)):
+            if _record_key(line) == key:
+                return line.decode("utf-8")
+        return None
+
+    def scan(self):
+        """Yield every record line in key order."""
+        for block_no in range(len(self.blocks)):
+            for line in self.read_block(block_no):
+                yield line.decode("utf-8")
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+if __name__ == "__main__":
+    import sys
+
+    SRC_PATH = sys.argv[1] if len(sys.argv) > 1 else os.path.join("..", "students_db.txt")
+    BENCH_SRC_PATH = "block_bench_src.txt"
+    # `key_size` counts characters, so multi-byte keys must round-trip too
+    NON_ASCII_NAMES = ["José Núñez", "Zoë Ångström", "Łukasz Żółć", "李雷"]
+
+    with open(SRC_PATH, "rb") as f_src, open(BENCH_SRC_PATH, "wb") as f_bench:
+        f_bench.write(f_src.read())
+        for name in NON_ASCII_NAMES:
+            data = f"2024-01-01{SEPARATOR}90{SEPARATOR}non-ASCII key"
+            f_bench.write(f"{len(name)}{SEPARATOR}{len(data)}{SEPARATOR}{name}{SEPARATOR}{data}\n".encode("utf-8"))
+    SRC_PATH = BENCH_SRC_PATH
+    raw_size = os.path.getsize(SRC_PATH)
+
+    def scan_text():
+        count = 0
+        with open(SRC_PATH, "rb") as f_src:
+            for line in f_src:
+                line.decode("utf-8")
+                count += 1
+        return count
+
+    start = time.time()
+    count = scan_text()
+    raw_scan = time.time() - start
+    print(f"Block storage for `{SRC_PATH}` ({count} records):")
+    print(f"raw text:\t{raw_size} bytes\tscan: {raw_scan:.6f} s ({raw_size / raw_scan / 1e6:.1f} MB/s)")
+
+    with open(SRC_PATH, "rb") as f_src:
+        some_keys = [_record_key(line).decode("utf-8") for line in f_src][::max(1, count // 100)]
+    some_keys += NON_ASCII_NAMES
+
+    for codec in CODECS:
+        dst_path = f"block_bench.{codec}"
+        start = time.time()
+        blocks = convert_text_file(SRC_PATH, dst_path, codec)
+        write_time = time.time() - start
+        size = os.path.getsize(dst_path)
+
+        with BlockFileReader(dst_path) as reader:
+            start = time.time()
+            scanned = sum(1 for _ in reader.scan())
+            scan_time = time.time() - start
+
+            start = time.time()
+            for name in some_keys:
+                reader.get(name)
+            get_time = (time.time() - start) / len(some_keys)
+
+            missing = [name for name in some_keys if reader.get(name) is None]
+            if missing:
+                raise AssertionError(f"{codec}: keys not found in the block file: {missing}")
+
+        print(
+            f"{codec}:\t{size} bytes ({raw_size / size:.1f}x, {blocks} blocks)"
+            f"\twrite: {write_time:.6f} s\tscan: {scan_time:.6f} s ({scanned} records,"
+            f" {raw_size / scan_time / 1e6:.1f} MB/s of records)\tpoint read: {get_time:.6f} s"
+        )
+        os.remove(dst_path)
+    os.remove(BENCH_SRC_PATH)
@@ -0,0 +1,101 @@
+"""Persistent Bloom filter for key existence checks"""
+
+import hashlib
+import math
+import os
+import struct
+import zlib
+
+# ==================================================
+# Configs
+# ==================================================
+
+DEFAULT_CAPACITY = 100_000
+DEFAULT_FP_RATE = 0.01
+FILE_MAGIC = b"BLOOM1"
+# magic, bits count, hashes count, capacity, keys added, high-water mark, crc32 of bits
+FILE_HEADER = struct.Struct("<6sQIQQQI")
+
+# ==================================================
+# Bloom Filter
+# ==================================================
+
+class BloomFilter:
+    """Set membership with no false negatives and a tunable false-positive rate.
+
+    `key in bloom` being False means the key was definitely never added,
+    so the caller can skip looking for it on disk.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, fp_rate: float = DEFAULT_FP_RATE):
+        if capacity <= 0 or not 0 < fp_rate < 1:
+            raise ValueError("Bloom filter needs capacity > 0 and 0 < fp_rate < 1.")
+        self.capacity = capacity
+        self.bits_count = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes_count = max(1, round(self.bits_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bits_count + 7) // 8)
+        self.count = 0
+        self.high_water_mark = 0  # data file length covered when saved
+
+    def _positions(self, key: str):
+        """Bit positions of a key, by double hashing one 128-bit digest."""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        return [(h1 + i * h2) % self.bits_count for i in range(self.hashes_count)]
+
+    def add(self, key: str):
+        """Add a key."""
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def expected_fp_rate(self):
+        """False-positive rate for the keys added so far."""
+        return (1 - math.exp(-self.hashes_count * self.count / self.bits_count)) ** self.hashes_count
+
+    # ==================================================
+    # Persistence
+    # ==================================================
+
+    def save(self, file_path: str):
+        """Write the filter to disk with a checksum."""
+        header = FILE_HEADER.pack(
+            FILE_MAGIC, self.bits_count, self.hashes_count, self.capacity,
+            self.count, self.high_water_mark, zlib.crc32(self.bits),
+        )
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as f_bloom:
+            f_bloom.write(header + self.bits)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str):
+        """Read a saved filter. Return None if it is missing or corrupt."""
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, "rb") as f_bloom:
+            data = f_bloom.read()
+        if len(data) < FILE_HEADER.size:
+            return None
+        magic, bits_count, hashes_count, capacity, count, high_water_mark, checksum = (
+            FILE_HEADER.unpack_from(data)
+        )
+        bits = bytearray(data[FILE_HEADER.size:])
+        if magic != FILE_MAGIC or len(bits) != (bits_count + 7) // 8 or zlib.crc32(bits) != checksum:
+            return None
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.bits_count = bits_count
+        bloom.hashes_count = hashes_count
+        bloom.bits = bits
+        bloom.count = count
+        bloom.high_water_mark = high_water_mark
+        return bloom
@@ -0,0 +1,304 @@
+"""B+-tree index"""
+
+import bisect
+import json
+import os
+import struct
+import zlib
+
+# ==================================================
+# Configs
+# ==================================================
+
+DEFAULT_ORDER = 64  # max children per internal node, max keys per leaf - 1
+PAGE_SIZE = 4096
+PAGE_MAGIC = "BPTREE2"
+PAGE_HEADER = struct.Struct("<II")  # payload length, crc32 of the payload
+_MISSING = object()
+
+# ==================================================
+# Nodes
+# ==================================================
+
+class _Leaf:
+    """Leaf node holding sorted keys, their values and a link to the next leaf."""
+    __slots__ = ("keys", "values", "next")
+
+    def __init__(self, keys=None, values=None, next_leaf=None):
+        self.keys = keys if keys is not None else []
+        self.values = values if values is not None else []
+        self.next = next_leaf
+
+class _Internal:
+    """Internal node: `keys[i]` is the smallest key under `children[i + 1]`."""
+    __slots__ = ("keys", "children")
+
+    def __init__(self, keys=None, children=None):
+        self.keys = keys if keys is not None else []
+        self.children = children if children is not None else []
+
+def _even_chunks(items: list, max_size: int):
+    """Split `items` into the fewest chunks of at most `max_size`, evenly sized."""
+    count = -(-len(items) // max_size)
+    size, extra = divmod(len(items), count)
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        yield items[start:end]
+        start = end
+
+# ==================================================
+# B+-tree
+# ==================================================
+
+class BPlusTree:
+    """Ordered key -> value map with O(log n) point reads and ordered scans.
+
+    Leaves are linked left to right, so range and prefix scans walk the
+    leaf chain instead of materialising the keys.
+    """
+
+    def __init__(self, order: int = DEFAULT_ORDER):
+        if order < 3:
+            raise ValueError("B+-tree order must be at least 3.")
+        self.order = order
+        self.root = _Leaf()
+        self.size = 0
+        self.meta = {}
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        """Remove every key."""
+        self.root = _Leaf()
+        self.size = 0
+
+    def _find_leaf(self, key):
+        """Descend to the leaf that would hold `key`."""
+        node = self.root
+        while isinstance(node, _Internal):
+            node = node.children[bisect.bisect_right(node.keys, key)]
+        return node
+
+    def _first_leaf(self):
+        """Return the leftmost leaf."""
+        node = self.root
+        while isinstance(node, _Internal):
+            node = node.children[0]
+        return node
+
+    def get(self, key, default=None):
+        """Point lookup."""
+        leaf = self._find_leaf(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return leaf.values[i]
+        return default
+
+    def insert(self, key, value):
+        """Insert `key`, replacing the value if it already exists."""
+        split = self._insert(self.root, key, value)
+        if split is not None:
+            separator, right = split
+            self.root = _Internal([separator], [self.root, right])
+
+    def _insert(self, node, key, value):
+        """Insert below `node`. Return (separator, new right node) on split."""
+        if isinstance(node, _Leaf):
+            i = bisect.bisect_left(node.keys, key)
+            if i < len(node.keys) and node.keys[i] == key:
+                node.values[i] = value
+                return None
+            node.keys.insert(i, key)
+            node.values.insert(i, value)
+            self.size += 1
+            if len(node.keys) < self.order:
+                return None
+            mid = len(node.keys) // 2
+            right = _Leaf(node.keys[mid:], node.values[mid:], node.next)
+            del node.keys[mid:]
+            del node.values[mid:]
+            node.next = right
+            return right.keys[0], right
+
+        i = bisect.bisect_right(node.keys, key)
+        split = self._insert(node.children[i], key, value)
+        if split is None:
+            return None
+        separator, right = split
+        node.keys.insert(i, separator)
+        node.children.insert(i + 1, right)
+        if len(node.children) <= self.order:
+            return None
+        mid = len(node.keys) // 2
+        separator = node.keys[mid]
+        right = _Internal(node.keys[mid + 1:], node.children[mid + 1:])
+        del node.keys[mid:]
+        del node.children[mid + 1:]
+        return separator, right
+
+    def delete(self, key):
+        """Remove `key`. Return True if it was present.
+
+        Leaves are not merged, so a leaf may end up empty; lookups and
+        scans still work, they just visit it.
+        """
+        leaf = self._find_leaf(key)
+        i = bisect.bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            del leaf.keys[i]
+            del leaf.values[i]
+            self.size -= 1
+            return True
+        return False
+
+    def range(self, start=None, end=None):
+        """Yield (key, value) in key order for `start <= key < end`."""
+        if start is None:
+            leaf, i = self._first_leaf(), 0
+        else:
+            leaf = self._find_leaf(start)
+            i = bisect.bisect_left(leaf.keys, start)
+        while leaf is not None:
+            keys = leaf.keys
+            while i < len(keys):
+                if end is not None and keys[i] >= end:
+                    return
+                yield keys[i], leaf.values[i]
+                i += 1
+            leaf, i = leaf.next, 0
+
+    def prefix(self, prefix: str):
+        """Yield (key, value) for every string key starting with `prefix`."""
+        for key, value in self.range(prefix):
+            if not key.startswith(prefix):
+                return
+            yield key, value
+
+    def items(self):
+        """Yield every (key, value) in key order."""
+        return self.range()
+
+    # ==================================================
+    # Bulk Loading
+    # ==================================================
+
+    @classmethod
+    def bulk_load(cls, items, order: int = DEFAULT_ORDER):
+        """Build a tree bottom-up from (key, value) pairs already sorted by key."""
+        tree = cls(order)
+        keys, values = [], []
+        for key, value in items:
+            if keys and key <= keys[-1]:
+                raise ValueError("bulk_load needs strictly increasing keys.")
+            keys.append(key)
+            values.append(value)
+        if not keys:
+            return tree
+
+        leaves = []
+        start = 0
+        for chunk in _even_chunks(keys, order - 1):
+            end = start + len(chunk)
+            leaves.append(_Leaf(chunk, values[start:end]))
+            start = end
+        for left, right in zip(leaves, leaves[1:]):
+            left.next = right
+
+        level = [(leaf.keys[0], leaf) for leaf in leaves]
+        while len(level) > 1:
+            level = [
+                (group[0][0], _Internal([k for k, _ in group[1:]], [n for _, n in group]))
+                for group in _even_chunks(level, order)
+            ]
+        tree.root = level[0][1]
+        tree.size = len(keys)
+        return tree
+
+    # ==================================================
+    # Page File Persistence
+    # ==================================================
+
+    @staticmethod
+    def _page(payload: bytes):
+        """Pad a payload into one fixed-size page."""
+        if PAGE_HEADER.size + len(payload) > PAGE_SIZE:
+            raise ValueError("Entry does not fit in a page.")
+        page = PAGE_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        return page + b"\0" * (PAGE_SIZE - len(page))
+
+    def save(self, file_path: str):
+        """Write the leaf level to a page file; `meta` goes in the header page.
+
+        Keys and values must be JSON serialisable.
+        """
+        header = {"magic": PAGE_MAGIC, "order": self.order, "size": self.size, "meta": self.meta}
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as f_pages:
+            f_pages.write(self._page(json.dumps(header).encode("utf-8")))
+            entries = []
+            used = PAGE_HEADER.size
+            for key, value in self.items():
+                entry = json.dumps([key, value]).encode("utf-8")
+                if entries and used + len(entry) + 1 > PAGE_SIZE:
+                    f_pages.write(self._page(b"\n".join(entries)))
+                    entries, used = [], PAGE_HEADER.size
+                entries.append(entry)
+                used += len(entry) + 1
+            if entries:
+                f_pages.write(self._page(b"\n".join(entries)))
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str):
+        """Rebuild a tree saved with `save`.
+
+        Raise ValueError if the file is not a page file, or is truncated or
+        damaged: every page is checksummed and the entry count must match
+        the header.
+        """
+        with open(file_path, "rb") as f_pages:
+            header_page = cls._read_page(f_pages)
+            try:
+                header = json.loads(header_page) if header_page is not None else {}
+                if not isinstance(header, dict) or header.get("magic") != PAGE_MAGIC:
+                    raise ValueError(f"`{file_path}` is not a B+-tree page file.")
+
+                def entries():
+                    while True:
+                        payload = cls._read_page(f_pages)
+                        if payload is None:
+                            return
+                        for line in payload.split(b"\n"):
+                            key, value = json.loads(line)
+                            yield key, value
+
+                tree = cls.bulk_load(entries(), header["order"])
+                meta = header["meta"]
+            except (KeyError, TypeError) as exc:
+                raise ValueError(f"`{file_path}` has a malformed page: {exc!r}") from exc
+        if len(tree) != header["size"]:
+            raise ValueError(f"`{file_path}` is truncated: {len(tree)} of {header['size']} entries.")
+        tree.meta = meta
+        return tree
+
+    @staticmethod
+    def _read_page(f_pages):
+        """Read the payload of the next page, or None at end of file.
+
+        Raise ValueError for a partial page or a checksum mismatch.
+        """
+        page = f_pages.read(PAGE_SIZE)
+        if not page:
+            return None
+        if len(page) < PAGE_SIZE:
+            raise ValueError("Partial page at the end of the page file.")
+        length, checksum = PAGE_HEADER.unpack_from(page)
+        payload = page[PAGE_HEADER.size:PAGE_HEADER.size + length]
+        if length > PAGE_SIZE - PAGE_HEADER.size or zlib.crc32(payload) != checksum:
+            raise ValueError("Page checksum mismatch.")
+        return payload
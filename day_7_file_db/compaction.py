@@ -0,0 +1,191 @@
+"""Background compaction for append-only file DBs"""
+
+import os
+import threading
+import time
+
+# ==================================================
+# Configs
+# ==================================================
+
+SEPARATOR = ";"
+TOMBSTONE_DATA_SIZE = 0  # Real records always carry `date;mark;comment`
+COMPACT_SUFFIX = ".compact"
+
+# ==================================================
+# Record Helpers
+# ==================================================
+
+def format_tombstone(full_name: str, separator: str = SEPARATOR):
+    """Format a delete marker for `full_name`."""
+    return f"{len(full_name)}{separator}{TOMBSTONE_DATA_SIZE}{separator}{full_name}{separator}"
+
+def parse_key(line: str, separator: str = SEPARATOR):
+    """Return (key, is_tombstone) of a `key_size;data_size;key;data` line."""
+    key_size, data_size, rest = line.split(separator, 2)
+    return rest[:int(key_size)], int(data_size) == TOMBSTONE_DATA_SIZE
+
+# ==================================================
+# Compactor
+# ==================================================
+
+class Compactor:
+    """Rewrite a log file keeping only the latest live record per key.
+
+    Compaction works on the segment `[0, end)` where `end` is the file size
+    when the run starts, so appends keep flowing while it runs. Writers must
+    hold `lock` while appending; the compactor only takes it to copy the
+    tail written since `end` and to swap the new file in with `os.replace`.
+    Readers never wait: open handles keep the old file, new opens see the
+    compacted one. Text lines by default; for another record format pass
+    the file `header` bytes, `read_record(f_db)` returning the next raw
+    record (b"" at EOF) and `parse_record(raw)` returning (key,
+    is_tombstone), or None to drop the record.
+    """
+
+    def __init__(
+            self,
+            file_path: str,
+            separator: str = SEPARATOR,
+            interval: float = 5.0,
+            batch_size: int = 1_000,
+            on_swap=None,
+            header: bytes = b"",
+            read_record=None,
+            parse_record=None,
+        ):
+        self.file_path = file_path
+        self.separator = separator
+        self.header = header
+        self._read_record = read_record or (lambda f_db: f_db.readline())
+        self._parse = parse_record or self._parse_line
+        self.interval = interval
+        self.batch_size = batch_size
+        self.on_swap = on_swap  # Called with {key: new_offset} after a swap
+        self.lock = threading.Lock()
+        self.metrics = {
+            "runs": 0,
+            "reclaimed_bytes": 0,
+            "dropped_records": 0,
+            "total_duration": 0.0,
+            "last_reclaimed_bytes": 0,
+            "last_duration": 0.0,
+        }
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _parse_line(self, line: bytes):
+        """Return (key, is_tombstone) of a text line, or None if malformed."""
+        try:
+            return parse_key(line.decode("utf-8"), self.separator)
+        except ValueError:
+            return None
+
+    def _scan(self, f_db, end: int):
+        """Yield (offset, record) up to `end`, yielding the GIL between batches."""
+        offset = f_db.seek(len(self.header))
+        count = 0
+        while offset < end:
+            record = self._read_record(f_db)
+            if not record:
+                break
+            yield offset, record
+            offset += len(record)
+            count += 1
+            if count % self.batch_size == 0:
+                time.sleep(0)  # Let readers and writers run
+
+    def _latest_offsets(self, f_db, end: int):
+        """Map every key in `[0, end)` to the offset of its latest record."""
+        latest = {}
+        for offset, record in self._scan(f_db, end):
+            parsed = self._parse(record)
+            if parsed is None:
+                continue
+            key, tombstone = parsed
+            latest[key] = None if tombstone else offset
+        return latest
+
+    def _copy_tail(self, f_src, f_dst, start: int, new_index: dict):
+        """Copy records appended after `start` verbatim, indexing them."""
+        f_src.seek(start)
+        while record := self._read_record(f_src):
+            parsed = self._parse(record)
+            if parsed is not None:
+                key, tombstone = parsed
+                if tombstone:
+                    new_index.pop(key, None)
+                else:
+                    new_index[key] = f_dst.tell()
+            f_dst.write(record)
+
+    def compact(self):
+        """Run one compaction pass. Return the number of reclaimed bytes."""
+        if not os.path.exists(self.file_path):
+            return 0
+
+        start_time = time.time()
+        tmp_path = self.file_path + COMPACT_SUFFIX
+        end = os.path.getsize(self.file_path)
+        new_index = {}
+        dropped = 0
+
+        with open(self.file_path, "rb") as f_src, open(tmp_path, "wb") as f_dst:
+            f_dst.write(self.header)
+            latest = self._latest_offsets(f_src, end)
+            for offset, record in self._scan(f_src, end):
+                parsed = self._parse(record)
+                if parsed is None or latest.get(parsed[0]) != offset:
+                    dropped += 1
+                    continue
+                new_index[parsed[0]] = f_dst.tell()
+                f_dst.write(record)
+
+            with self.lock:
+                self._copy_tail(f_src, f_dst, end, new_index)
+                f_dst.flush()
+                os.fsync(f_dst.fileno())
+                old_size = f_src.seek(0, os.SEEK_END)
+                new_size = f_dst.tell()
+                os.replace(tmp_path, self.file_path)
+                if self.on_swap is not None:
+                    self.on_swap(new_index)
+
+        reclaimed = old_size - new_size
+        duration = time.time() - start_time
+        self.metrics["runs"] += 1
+        self.metrics["reclaimed_bytes"] += reclaimed
+        self.metrics["dropped_records"] += dropped
+        self.metrics["total_duration"] += duration
+        self.metrics["last_reclaimed_bytes"] = reclaimed
+        self.metrics["last_duration"] = duration
+        return reclaimed
+
+    # ==================================================
+    # Background Thread
+    # ==================================================
+
+    def _run(self):
+        """Compact every `interval` seconds until stopped."""
+        while not self._stop_event.wait(self.interval):
+            self.compact()
+
+    def start(self):
+        """Start compacting in a background daemon thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, waiting for a running pass to finish."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def print_metrics(self):
+        """Print compaction metrics."""
+        print(f"compaction runs: {self.metrics['runs']}")
+        print(f"reclaimed bytes: {self.metrics['reclaimed_bytes']}")
+        print(f"dropped records: {self.metrics['dropped_records']}")
+        print(f"compaction time taken: {self.metrics['total_duration']:.6f} s")
@@ -0,0 +1,307 @@
+"""Thread-safe File DB with hashed and sorted indexes"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from bplus_tree import BPlusTree
+from group_writer import GroupCommitWriter, POLICY_NONE
+
+# ==================================================
+# Configs
+# ==================================================
+
+FILE_PATH = "concurrent_db.txt"
+SEPARATOR = ";"
+READ_CHUNK_SIZE = 256  # bytes read per `pread` when fetching a record
+WRITE_BATCH_SIZE = 1_000  # max queued inserts applied under one write lock
+
+# ==================================================
+# Readers-Writer Lock
+# ==================================================
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer. Waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        """Enter as a reader."""
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        """Leave as a reader."""
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """Enter as the only writer."""
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        """Leave as the writer."""
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    def read_locked(self):
+        """Context manager holding the lock as a reader."""
+        return _Locked(self.acquire_read, self.release_read)
+
+    def write_locked(self):
+        """Context manager holding the lock as the writer."""
+        return _Locked(self.acquire_write, self.release_write)
+
+class _Locked:
+    """Call `acquire` on enter and `release` on exit."""
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, *exc):
+        self._release()
+
+# ==================================================
+# File DB
+# ==================================================
+
+def _format_student_record(full_name, enrollment_date, mark, comment, separator=SEPARATOR):
+    """Format the record for operation."""
+    data = f"{enrollment_date}{separator}{mark}{separator}{comment}"
+    return f"{len(full_name)}{separator}{len(data)}{separator}{full_name}{separator}{data}"
+
+class FileDB:
+    """Append-only student file with a hash index and a B+-tree index.
+
+    Lookups take the read lock only to fetch offsets and then read the
+    record with `os.pread` on a shared descriptor, so readers never
+    serialise on a file position. Inserts are queued to a single writer
+    thread that appends a batch, flushes it and then publishes the new
+    offsets to both indexes under the write lock.
+    """
+
+    def __init__(self, file_path: str = FILE_PATH, write_policy: str = POLICY_NONE):
+        self.file_path = file_path
+        self.hash_index = {}
+        self.sorted_index = BPlusTree()
+        self.lock = ReadWriteLock()
+        self.writer = GroupCommitWriter(file_path, policy=write_policy)
+        self._fd = os.open(file_path, os.O_RDONLY)
+        self._build_indexes()
+        self.error = None  # First exception raised by the writer thread
+        self._closed = False
+        self._close_lock = threading.Lock()  # No insert is queued after the close sentinel
+
+        self._queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer_thread.start()
+
+    def _build_indexes(self):
+        """Build both indexes from file."""
+        with open(self.file_path, "rb") as f_db:
+            pos = 0
+            for line in f_db:
+                try:
+                    key_size, _, rest = line.decode("utf-8").split(SEPARATOR, 2)
+                    key = rest[:int(key_size)]
+                except ValueError:
+                    pass  # Skip malformed lines, e.g. a torn last write
+                else:
+                    self.hash_index[key] = pos
+                    self.sorted_index.insert(key, pos)
+                pos += len(line)
+
+    def _read_at(self, position: int):
+        """Read one record with `pread`; safe to call from any thread."""
+        data = b""
+        while True:
+            chunk = os.pread(self._fd, READ_CHUNK_SIZE, position + len(data))
+            newline = chunk.find(b"\n")
+            if newline >= 0:
+                return (data + chunk[:newline]).decode("utf-8")
+            if not chunk:
+                return data.decode("utf-8")
+            data += chunk
+
+    # ==================================================
+    # Writes
+    # ==================================================
+
+    def insert(self, full_name, enrollment_date, mark, comment):
+        """Queue an insert. The future resolves to the offset, or None if it exists.
+
+        Raise RuntimeError after `close`: the writer thread is gone and
+        nothing would resolve the future.
+        """
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("FileDB is closed.")
+            self._queue.put((full_name, enrollment_date, mark, comment, future))
+        return future
+
+    def insert_student(self, full_name, enrollment_date, mark, comment):
+        """Insert and wait until the student is visible to readers."""
+        return self.insert(full_name, enrollment_date, mark, comment).result()
+
+    def _run_writer(self):
+        """Apply queued inserts in batches until a `None` sentinel arrives.
+
+        If a batch fails, its futures get the exception, and so does every
+        insert queued afterwards: after a failed append the file may hold
+        part of the batch, so nothing more is written.
+        """
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self.error is None:
+                try:
+                    self._apply_batch(batch)
+                except Exception as exc:
+                    self.error = exc
+            if self.error is not None:
+                for item in batch:
+                    if item is not None and not item[-1].done():
+                        item[-1].set_exception(self.error)
+            if None in batch:
+                return
+
+    def _apply_batch(self, batch):
+        """Append a batch, flush it, then publish the offsets and resolve its futures."""
+        applied = []
+        seen = set()
+        for item in batch:
+            if item is None:
+                continue
+            full_name, enrollment_date, mark, comment, future = item
+            if full_name in self.hash_index or full_name in seen:
+                future.set_result(None)
+                continue
+            seen.add(full_name)
+            record = _format_student_record(full_name, enrollment_date, mark, comment)
+            applied.append((full_name, self.writer.append(record), future))
+        self.writer.flush()
+
+        with self.lock.write_locked():
+            for full_name, position, _ in applied:
+                self.hash_index[full_name] = position
+                self.sorted_index.insert(full_name, position)
+        for _, position, future in applied:
+            future.set_result(position)
+
+    # ==================================================
+    # Reads
+    # ==================================================
+
+    def select_student_hash(self, full_name):
+        """Select student by full_name using the hash index."""
+        with self.lock.read_locked():
+            position = self.hash_index.get(full_name)
+        if position is None:
+            return None
+        return self._read_at(position)
+
+    def select_student_sorted(self, full_name):
+        """Select student by full_name using the B+-tree index."""
+        with self.lock.read_locked():
+            position = self.sorted_index.get(full_name)
+        if position is None:
+            return None
+        return self._read_at(position)
+
+    def select_students_hash(self, full_names):
+        """Select many students by full_name under one read lock, reading in file order.
+
+        Return {full_name: record or None}.
+        """
+        with self.lock.read_locked():
+            positions = {name: self.hash_index.get(name) for name in full_names}
+        found = sorted((position, name) for name, position in positions.items() if position is not None)
+        records = dict.fromkeys(positions)
+        for position, name in found:
+            records[name] = self._read_at(position)
+        return records
+
+    def select_students_prefix(self, prefix):
+        """Select students whose full_name starts with `prefix`, in name order."""
+        with self.lock.read_locked():
+            positions = [position for _, position in self.sorted_index.prefix(prefix)]
+        return [self._read_at(position) for position in positions]
+
+    def close(self):
+        """Drain the writer queue and close the files."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._writer_thread.join()
+        self.writer.close()
+        os.close(self._fd)
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+if __name__ == "__main__":
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from bench_datasets.dataset_cache import load_dataset
+
+    RECORDS_COUNT = 50_000
+    READS_COUNT = 200_000
+    THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+    if os.path.exists(FILE_PATH):
+        os.remove(FILE_PATH)
+    db = FileDB(FILE_PATH)
+
+    with load_dataset("students", RECORDS_COUNT) as dataset:
+        students = list(dataset.rows("full_name", "enrollment_date", "mark", "comment"))
+    names = [student[0] for student in students]
+    futures = [db.insert(*student) for student in students]
+    for future in futures:
+        future.result()
+    print(f"Concurrent File DB: {len(db.hash_index)} students")
+
+    def read_names(chunk):
+        for name in chunk:
+            db.select_student_hash(name)
+
+    lookups = [names[i % len(names)] for i in range(READS_COUNT)]
+    for threads in THREAD_COUNTS:
+        chunks = [lookups[i::threads] for i in range(threads)]
+        r_start = time.time()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(read_names, chunks))
+        time_taken = time.time() - r_start
+        print(f"threads: {threads}\treads/s: {int(READS_COUNT / time_taken)}")
+
+    db.close()
+    os.remove(FILE_PATH)
@@ -1,16 +1,67 @@
 """File DB"""
 
+import atexit
+import bisect
 import os
 import time
 
 from faker import Faker
 
+from binary_codec import (
+    BINARY_HEADER, FORMAT_BINARY, FORMAT_TEXT, encode_line, open_data_file,
+    parse_raw_key, read_line_at, read_raw_record, scan_binary_records,
+)
+from bloom_filter import BloomFilter
+from compaction import Compactor, format_tombstone, parse_key
+from group_writer import GroupCommitWriter, POLICY_NONE
+from record_reader import MmapRecordReader, find_latest_record, scan_records
+from secondary_index import FIELDS, SecondaryIndex, build_secondary_indexes, parse_fields
+
 # ==================================================
 # Configs
 # ==================================================
 
-FILE_PATH = "file_db.txt"
+FILE_FORMAT = FORMAT_TEXT  # `text` lines or `binary` records, see binary_codec
+FILE_PATH = "file_db.bin" if FILE_FORMAT == FORMAT_BINARY else "file_db.txt"
 SEPARATOR = ";"
+COMPACTION_INTERVAL = 1.0  # seconds between background compaction passes
+WRITE_POLICY = POLICY_NONE  # fsync policy, see group_writer.POLICIES
+BLOOM_FILE_PATH = "file_db.bloom"
+BLOOM_CAPACITY = 100_000
+BLOOM_FP_RATE = 0.01
+# `mmap` rfind, or `reverse` block reads from EOF without mmap; text files only,
+# binary records are found through the version chains
+LATEST_LOOKUP = "mmap"
+bloom_stats = {"skipped_scans": 0, "scans": 0}
+SECONDARY_INDEXES = ("enrollment_date", "mark")  # fields with a secondary index
+SECONDARY_INDEX_PATH = "file_db.{field}.idx"
+secondary_indexes = {}  # field -> SecondaryIndex
+secondary_state = {"stale": False}  # offsets moved by compaction, rebuild before use
+version_chains = {}  # full_name -> [(offset, is_tombstone), ...], oldest first
+version_state = {"stale": False, "epoch": 0}  # epoch counts compaction swaps
+commit_log = []  # (timestamp, file size after the write), maps times to offsets
+COMMIT_LOG_RESOLUTION = 0.001  # seconds; writes closer together share an entry
+
+def _reopen_writer(_new_index):
+    """Point the writer at the compacted file."""
+    writer.reopen()
+    secondary_state["stale"] = True
+    version_state["stale"] = True
+    version_state["epoch"] += 1
+
+# Compactor hooks for binary records, text lines need none
+BINARY_RECORDS = {"header": BINARY_HEADER, "read_record": read_raw_record, "parse_record": parse_raw_key}
+
+open_data_file(FILE_PATH, FILE_FORMAT)
+compactor = Compactor(
+    FILE_PATH,
+    SEPARATOR,
+    interval=COMPACTION_INTERVAL,
+    on_swap=_reopen_writer,
+    **(BINARY_RECORDS if FILE_FORMAT == FORMAT_BINARY else {}),
+)
+writer = GroupCommitWriter(FILE_PATH, policy=WRITE_POLICY, lock=compactor.lock)
+atexit.register(writer.close)
 
 # ==================================================
 # Helper Functions
@@ -25,19 +76,70 @@ def _delete_file_db(file_path: str = FILE_PATH):
     print(f"Database `{file_path}` deleted successfully.")
     return True
 
-def _write_file_db(content: str, file_path: str = FILE_PATH):
+def _write_file_db(content: str):
     """Write to file db."""
-    with open(file_path, "a", encoding="utf-8") as f_db:
-        f_db.write(content + "\n")
-        return True
+    if FILE_FORMAT == FORMAT_BINARY:
+        position = writer.append_bytes(encode_line(content, SEPARATOR))
+    else:
+        position = writer.append(content)
+    _record_version(content, position)
+    return position  # Return the file position for indexing
 
-def _read_file_db(file_path: str = FILE_PATH):
-    """Read from file db."""
-    if not os.path.exists(file_path):
-        print(f"Error: Database `{file_path}` does not exists.")
-        return False
-    with open(file_path, "r", encoding="utf-8") as f_db:
-        return f_db.readlines()
+def scan(predicate=None, start_offset: int = 0):
+    """Stream (offset, full_name, data) records from the file db, lazily.
+
+    Stop iterating early to stop reading the file.
+    """
+    writer.flush()
+    if FILE_FORMAT == FORMAT_BINARY:
+        return scan_binary_records(FILE_PATH, predicate, start_offset, SEPARATOR)
+    return scan_records(FILE_PATH, predicate, start_offset, SEPARATOR)
+
+def _read_record(f_db, position: int):
+    """Read the record at a byte position of an open file as a text line."""
+    if FILE_FORMAT == FORMAT_BINARY:
+        return read_line_at(f_db, position, SEPARATOR)
+    f_db.seek(position)
+    return f_db.readline().decode("utf-8").strip()
+
+def _find_latest(full_name: str, separator: str = SEPARATOR):
+    """Return (offset, is_tombstone) of the student's latest record, or None.
+
+    Binary records have no text to `rfind`, so they go through the
+    version chains instead of the mmap reader.
+    """
+    if FILE_FORMAT == FORMAT_BINARY:
+        _refresh_version_chains()
+        chain = version_chains.get(full_name)
+        return chain[-1] if chain else None
+    writer.flush()
+    with MmapRecordReader(FILE_PATH, separator) as reader:
+        return reader.find_latest(full_name)
+
+def _read_latest(full_name: str, separator: str = SEPARATOR):
+    """Return (offset, line) of the student's latest live record, or None.
+
+    A binary offset comes from the version chains, so it is looked up and
+    read under the compactor lock: a swap in between would move the record.
+    """
+    if FILE_FORMAT == FORMAT_BINARY:
+        while True:
+            _refresh_version_chains()
+            writer.flush()
+            with compactor.lock:
+                if version_state["stale"]:
+                    continue  # Compaction swapped the file meanwhile
+                chain = version_chains.get(full_name)
+                if not chain or chain[-1][1]:
+                    return None
+                with open(FILE_PATH, "rb") as f_db:
+                    return chain[-1][0], _read_record(f_db, chain[-1][0])
+    writer.flush()
+    with MmapRecordReader(FILE_PATH, separator) as reader:
+        latest = reader.find_latest(full_name)
+        if latest is None or latest[1]:
+            return None
+        return latest[0], reader.read_at(latest[0]).strip()
 
 def _format_student_record(
         full_name: str,
@@ -54,17 +156,192 @@ def _format_student_record(
     data_size = len(data)
     return f"{key_size}{separator}{data_size}{separator}{key}{separator}{data}"
 
+def _build_bloom_filter():
+    """Build a Bloom filter from every key in the file, sized for twice as many.
+
+    Past its capacity a filter's false-positive rate climbs above
+    BLOOM_FP_RATE, and its bits cannot be re-spread over a bigger array,
+    so it is rebuilt from the keys instead.
+    """
+    keys = {key for _, key, _ in scan()}
+    built = BloomFilter(max(BLOOM_CAPACITY, 2 * len(keys)), BLOOM_FP_RATE)
+    for key in keys:
+        built.add(key)
+    return built
+
+def _open_bloom_filter():
+    """Load the saved Bloom filter and add keys written after it, or rebuild it."""
+    data_size = os.path.getsize(FILE_PATH) if os.path.exists(FILE_PATH) else 0
+    loaded = BloomFilter.load(BLOOM_FILE_PATH)
+    if loaded is None or loaded.high_water_mark > data_size:
+        return _build_bloom_filter()
+    for _, key, _ in scan(start_offset=loaded.high_water_mark):
+        if key not in loaded:  # Updates repeat keys; keep `count` close to distinct keys
+            loaded.add(key)
+    if len(loaded) > loaded.capacity:
+        return _build_bloom_filter()
+    return loaded
+
+def _add_to_bloom_filter(key: str):
+    """Add a new key, rebuilding the filter once it holds more than its capacity."""
+    global bloom
+    bloom.add(key)
+    if len(bloom) > bloom.capacity:
+        bloom = _build_bloom_filter()
+
+def _save_bloom_filter():
+    """Persist the Bloom filter with the data file length it covers."""
+    writer.flush()
+    bloom.high_water_mark = os.path.getsize(FILE_PATH)
+    bloom.save(BLOOM_FILE_PATH)
+
+bloom = _open_bloom_filter()
+atexit.register(_save_bloom_filter)
+
+def _open_secondary_indexes():
+    """Load the saved secondary indexes, or rebuild them if any is stale."""
+    data_size = os.path.getsize(FILE_PATH) if os.path.exists(FILE_PATH) else 0
+    loaded = {}
+    for field in SECONDARY_INDEXES:
+        path = SECONDARY_INDEX_PATH.format(field=field)
+        loaded[field] = SecondaryIndex.load(path, field, data_size)
+    if None in loaded.values():
+        loaded = build_secondary_indexes(FILE_PATH, SECONDARY_INDEXES, SEPARATOR, FILE_FORMAT)
+    secondary_indexes.update(loaded)
+
+def _refresh_secondary_indexes():
+    """Rebuild the secondary indexes after compaction moved the records."""
+    if not secondary_state["stale"]:
+        return
+    writer.flush()
+    with compactor.lock:
+        secondary_indexes.update(
+            build_secondary_indexes(FILE_PATH, SECONDARY_INDEXES, SEPARATOR, FILE_FORMAT)
+        )
+        secondary_state["stale"] = False
+
+def _save_secondary_indexes():
+    """Persist the secondary indexes with the data file length they cover."""
+    _refresh_secondary_indexes()
+    writer.flush()
+    data_size = os.path.getsize(FILE_PATH)
+    for field, index in secondary_indexes.items():
+        index.save(SECONDARY_INDEX_PATH.format(field=field), data_size)
+
+def _index_record(values: dict, offset: int):
+    """Add a record version to every secondary index.
+
+    Values are coerced like `parse_fields` does when rebuilding from the
+    file, so e.g. a mark passed as "85" is indexed as 85, not as a string.
+    """
+    for field, index in secondary_indexes.items():
+        index.add(FIELDS[field][1](values[field]), offset)
+
+def _unindex_latest(full_name: str):
+    """Remove the current version of a student from every secondary index."""
+    latest = _read_latest(full_name)
+    if latest is None:
+        return
+    _, values = parse_fields(latest[1], SECONDARY_INDEXES)
+    for field, index in secondary_indexes.items():
+        index.remove(values[field], latest[0])
+
+_open_secondary_indexes()
+atexit.register(_save_secondary_indexes)
+
+# ==================================================
+# Version Chains and Snapshots
+# ==================================================
+
+class SnapshotTooOldError(Exception):
+    """Raised when compaction rewrote the file after a snapshot was taken."""
+
+class Snapshot:
+    """Consistent view of the file db: the records before byte `end`.
+
+    Appends never move older records, so a snapshot only needs the file
+    length. Compaction does move them; `epoch` detects that.
+    """
+
+    def __init__(self, end: int, epoch: int):
+        self.end = end
+        self.epoch = epoch
+
+    def read_student(self, full_name: str):
+        """Read the student as it was when the snapshot was taken."""
+        return read_student(full_name, as_of=self)
+
+def _build_version_chains():
+    """Rebuild every key's version chain from the file."""
+    version_chains.clear()
+    for offset, key, data in scan():
+        version_chains.setdefault(key, []).append((offset, not data))
+    commit_log.clear()
+    commit_log.append((time.time(), writer.size))
+
+def _refresh_version_chains():
+    """Rebuild the version chains after compaction moved the records."""
+    if not version_state["stale"]:
+        return
+    writer.flush()
+    with compactor.lock:
+        _build_version_chains()
+        version_state["stale"] = False
+
+def _record_version(content: str, position: int):
+    """Add a just written record to its key's version chain."""
+    key, tombstone = parse_key(content)
+    version_chains.setdefault(key, []).append((position, tombstone))
+    now = time.time()
+    if commit_log and now - commit_log[-1][0] < COMMIT_LOG_RESOLUTION:
+        commit_log[-1] = (commit_log[-1][0], writer.size)
+    else:
+        commit_log.append((now, writer.size))
+
+def snapshot():
+    """Take a snapshot of the file db as it is now."""
+    return Snapshot(writer.size, version_state["epoch"])
+
+def _resolve_as_of(as_of=None, as_of_time=None, as_of_offset=None):
+    """Turn a Snapshot, timestamp or byte offset into the file length to read up to."""
+    given = [value for value in (as_of, as_of_time, as_of_offset) if value is not None]
+    if len(given) > 1:
+        raise ValueError("Pass only one of `as_of`, `as_of_time` and `as_of_offset`.")
+    if as_of is not None:
+        if as_of.epoch != version_state["epoch"]:
+            raise SnapshotTooOldError("Compaction rewrote the file after this snapshot.")
+        return as_of.end
+    if as_of_time is not None:
+        i = bisect.bisect_right(commit_log, (as_of_time, float("inf"))) - 1
+        if i < 0:
+            raise ValueError("No history before the file db was opened or last compacted.")
+        return commit_log[i][1]
+    return as_of_offset
+
+def _read_version(full_name: str, end: int):
+    """Read the latest version of a student written before byte `end`."""
+    _refresh_version_chains()
+    chain = version_chains.get(full_name)
+    if not chain:
+        return False
+    i = bisect.bisect_left(chain, (end,)) - 1
+    if i < 0 or chain[i][1]:
+        return False  # Not written yet, or deleted, as of `end`
+    position = chain[i][0]
+    writer.ensure_readable(position)
+    with open(FILE_PATH, "rb") as f_db:
+        return _read_record(f_db, position)
+
+_build_version_chains()
+
 def _if_student_exists(full_name: str, separator: str = SEPARATOR):
-    """Fine if the student already exists or not."""
-    content = _read_file_db()
-    if content is False:
+    """Find if the student already exists (and is not deleted) or not."""
+    if full_name not in bloom:
+        bloom_stats["skipped_scans"] += 1  # Definitely absent, no file read
         return False
-    for line in content:
-        _, _, key, *_ = line.split(separator)
-        if key == full_name:
-            return True
-        else:
-            return False
+    bloom_stats["scans"] += 1
+    latest = _find_latest(full_name, separator)
+    return latest is not None and not latest[1]
 
 # ==================================================
 # Create, Update, Read operations
@@ -82,7 +359,9 @@ def insert_student(
         print(f"Student {full_name} already exists.")
         return None
     record = _format_student_record(full_name, enrollment_date, mark, comment)
-    _write_file_db(record)
+    position = _write_file_db(record)
+    _add_to_bloom_filter(full_name)
+    _index_record({"enrollment_date": enrollment_date, "mark": mark}, position)
 
 def update_student(
         full_name: str,
@@ -93,26 +372,69 @@ def update_student(
     """Update student if exists. This will add new row at the end."""
     already_exists = _if_student_exists(full_name)
     if already_exists:
+        _unindex_latest(full_name)
         record = _format_student_record(full_name, enrollment_date, mark, comment)
-        _write_file_db(record)
+        position = _write_file_db(record)
+        _index_record({"enrollment_date": enrollment_date, "mark": mark}, position)
 
-def read_student(full_name: str, separator: str = SEPARATOR):
-    """Read the latest student by full_name."""
-    content = _read_file_db()
-    if content is False:
-        return False
+def read_student(
+        full_name: str,
+        separator: str = SEPARATOR,
+        as_of: Snapshot = None,
+        as_of_time: float = None,
+        as_of_offset: int = None,
+    ):
+    """Read the latest student by full_name.
 
-    latest_record = None
-    for line in content:
-        _, _, key, *_ = line.split(separator)
-        if key == full_name:
-            latest_record = line.strip()
-    if latest_record:
-        # print(f"Latest record for {full_name}: {latest_record}")
-        return latest_record
-    else:
+    `as_of` (a Snapshot), `as_of_time` (a `time.time()` timestamp) or
+    `as_of_offset` (a file length in bytes) reads the version that was
+    current then, through the key's version chain.
+    """
+    if as_of is not None or as_of_time is not None or as_of_offset is not None:
+        return _read_version(full_name, _resolve_as_of(as_of, as_of_time, as_of_offset))
+    if LATEST_LOOKUP == "reverse" and FILE_FORMAT == FORMAT_TEXT:
+        writer.flush()
+        latest = find_latest_record(FILE_PATH, full_name, separator)
+        if latest is None or not latest[2]:
+            return False
+        _, key, data = latest
+        return _format_student_record(key, *data.split(separator, 2))
+    latest = _read_latest(full_name, separator)
+    if latest is None:
         # print(f"Error: Student {full_name} not found.")
         return False
+    return latest[1]
+
+def delete_student(full_name: str):
+    """Delete student by appending a tombstone, dropped on next compaction."""
+    _unindex_latest(full_name)
+    _write_file_db(format_tombstone(full_name))
+
+# ==================================================
+# Secondary Index Queries
+# ==================================================
+
+def find_offsets(field: str, start=None, end=None):
+    """Offsets of live students with `start <= field < end`, in field order."""
+    _refresh_secondary_indexes()
+    return list(secondary_indexes[field].range(start, end))
+
+def read_students_at(offsets):
+    """Read the records at the given offsets."""
+    writer.flush()
+    if FILE_FORMAT == FORMAT_BINARY:
+        with open(FILE_PATH, "rb") as f_db:
+            return [_read_record(f_db, offset) for offset in offsets]
+    with MmapRecordReader(FILE_PATH) as reader:
+        return [reader.read_at(offset).strip() for offset in offsets]
+
+def select_students_by_mark(low: int, high: int):
+    """Select students with `low <= mark < high`."""
+    return read_students_at(find_offsets("mark", low, high))
+
+def select_students_enrolled(start_date: str, end_date: str):
+    """Select students with `start_date <= enrollment_date < end_date`."""
+    return read_students_at(find_offsets("enrollment_date", start_date, end_date))
 
 # ==================================================
 # Performance Measurements
@@ -150,5 +472,63 @@ def measure_performance():
     read_time_avg = round(read_time_avg/operations_count, 6)
     read_time_taken = f"{read_time_avg:.10f}"
     print(f"select time taken for {operations_count} operations: {read_time_taken} s")
+    print(
+        f"bloom filter skipped {bloom_stats['skipped_scans']} existence scans, "
+        f"ran {bloom_stats['scans']} (expected fp rate {bloom.expected_fp_rate():.4f})"
+    )
 
+compactor.start()
 measure_performance()
+compactor.stop()
+
+compactor.compact()
+compactor.print_metrics()
+
+def measure_secondary_index():
+    """Compare a mark range query through the index against a full scan."""
+    s_start = time.time()
+    scanned = sum(
+        1 for _, _, data in scan()
+        if data and 100 <= int(data.split(SEPARATOR, 2)[1]) < 200
+    )
+    scan_time = round(time.time() - s_start, 6)
+
+    b_start = time.time()
+    _refresh_secondary_indexes()  # Compaction moved the offsets
+    rebuild_time = round(time.time() - b_start, 6)
+
+    i_start = time.time()
+    found = len(select_students_by_mark(100, 200))
+    index_time = round(time.time() - i_start, 6)
+    print(f"mark range [100, 200) full scan: {scanned} students in {scan_time:.6f} s")
+    print(f"mark range [100, 200) secondary index: {found} students in {index_time:.6f} s")
+    print(f"secondary index rebuild after compaction: {rebuild_time:.6f} s")
+
+measure_secondary_index()
+
+def measure_snapshot_reads(reads_count: int = 1_000):
+    """Update students after a snapshot and read them back both ways."""
+    _refresh_version_chains()
+    names = [name for name, chain in version_chains.items() if not chain[-1][1]][:reads_count]
+    before = {name: read_student(name) for name in names}
+    snap = snapshot()
+    timestamp = time.time()
+    time.sleep(COMMIT_LOG_RESOLUTION)
+    for name in names:
+        update_student(name, "2024-01-01", 0, "updated after snapshot")
+
+    s_start = time.time()
+    consistent = sum(1 for name in names if snap.read_student(name) == before[name])
+    snap_time = round((time.time() - s_start) / len(names), 6)
+    t_start = time.time()
+    as_of_time = sum(1 for name in names if read_student(name, as_of_time=timestamp) == before[name])
+    time_time = round((time.time() - t_start) / len(names), 6)
+    l_start = time.time()
+    for name in names:
+        read_student(name)
+    latest_time = round((time.time() - l_start) / len(names), 6)
+    print(f"snapshot read: {snap_time:.10f} s ({consistent}/{len(names)} saw the old version)")
+    print(f"as_of timestamp read: {time_time:.10f} s ({as_of_time}/{len(names)} saw the old version)")
+    print(f"latest read: {latest_time:.10f} s")
+
+measure_snapshot_reads()
@@ -0,0 +1,246 @@
+"""Group-commit append writer for file DBs"""
+
+import os
+import threading
+import time
+
+# ==================================================
+# Configs
+# ==================================================
+
+POLICY_NONE = "none"          # write when the buffer fills, never fsync
+POLICY_EVERY_N = "every_n"    # fsync after every `every_n` records
+POLICY_INTERVAL = "interval"  # fsync every `interval_ms` milliseconds
+POLICY_ALWAYS = "always"      # fsync before `append` returns
+POLICIES = (POLICY_NONE, POLICY_EVERY_N, POLICY_INTERVAL, POLICY_ALWAYS)
+
+DEFAULT_BUFFER_SIZE = 1 << 20  # 1 MB
+
+# ==================================================
+# Writer
+# ==================================================
+
+class GroupCommitWriter:
+    """Long-lived append handle with an in-memory buffer.
+
+    `append` returns the byte offset the record will live at, before it
+    reaches the file; call `flush` (or `ensure_readable`) before reading
+    it back. Only one thread writes to the file at a time. Records
+    appended while a write or fsync is in progress are buffered and go
+    out together with the next one, so with the `always` policy
+    concurrent callers share a single fsync (group commit).
+    """
+
+    def __init__(
+            self,
+            file_path: str,
+            policy: str = POLICY_NONE,
+            every_n: int = 1_000,
+            interval_ms: int = 100,
+            buffer_size: int = DEFAULT_BUFFER_SIZE,
+            lock=None,
+        ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown fsync policy `{policy}`, use one of {POLICIES}.")
+        self.file_path = file_path
+        self.policy = policy
+        self.every_n = every_n
+        self.interval_ms = interval_ms
+        self.buffer_size = buffer_size
+        self.file_lock = lock  # Held around every physical write, e.g. a compactor lock
+
+        self._cond = threading.Condition()
+        self._file = open(file_path, "ab", buffering=0)
+        self._chunks = []
+        self._buffered = 0
+        self._in_flight = 0  # bytes taken by the leader, not yet written
+        self._written = self._file.seek(0, os.SEEK_END)  # bytes handed to the OS
+        self._appended_seq = 0   # records appended
+        self._written_seq = 0    # records handed to the OS
+        self._durable_seq = 0    # records fsynced
+        self._unsynced = 0
+        self._writing = False
+        self.metrics = {"records": 0, "writes": 0, "fsyncs": 0}
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        if policy == POLICY_INTERVAL:
+            self._thread = threading.Thread(target=self._run_interval, daemon=True)
+            self._thread.start()
+
+    @property
+    def size(self):
+        """Logical file size, including records still in the buffer."""
+        return self._written + self._in_flight + self._buffered
+
+    @property
+    def written_size(self):
+        """Bytes already written to the file."""
+        return self._written
+
+    def append(self, content: str):
+        """Buffer one record line and return its byte offset."""
+        return self.append_bytes((content + "\n").encode("utf-8"))
+
+    def append_bytes(self, data: bytes):
+        """Buffer one already-encoded record, e.g. a binary one. Return its byte offset."""
+        with self._cond:
+            position = self._written + self._in_flight + self._buffered
+            self._chunks.append(data)
+            self._buffered += len(data)
+            self._appended_seq += 1
+            self._unsynced += 1
+            self.metrics["records"] += 1
+            seq = self._appended_seq
+            full = self._buffered >= self.buffer_size
+
+        if self.policy == POLICY_ALWAYS:
+            self._commit(seq, sync=True)
+        elif self.policy == POLICY_EVERY_N and self._unsynced >= self.every_n:
+            self._commit(seq, sync=True)
+        elif full:
+            self._commit(seq, sync=False)
+        return position
+
+    def _commit(self, seq: int, sync: bool):
+        """Make records up to `seq` written (and fsynced if `sync`).
+
+        The first caller becomes the leader and writes everything buffered
+        so far; callers arriving meanwhile wait and are usually covered by
+        that write or by the next leader's.
+        """
+        with self._cond:
+            while (self._durable_seq if sync else self._written_seq) < seq:
+                if self._writing:
+                    self._cond.wait()
+                    continue
+                self._writing = True
+                chunks, self._chunks = self._chunks, []
+                self._in_flight, self._buffered = self._buffered, 0
+                batch_seq = self._appended_seq
+                self._cond.release()
+                try:
+                    self._write(b"".join(chunks), sync)
+                finally:
+                    self._cond.acquire()
+                    self._written += self._in_flight
+                    self._in_flight = 0
+                    self._written_seq = batch_seq
+                    if sync:
+                        self._durable_seq = batch_seq
+                        self._unsynced = 0
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write(self, data: bytes, sync: bool):
+        """Write one batch in a single syscall, then optionally fsync."""
+        if self.file_lock is not None:
+            self.file_lock.acquire()
+        try:
+            if data:
+                self._file.write(data)
+                self.metrics["writes"] += 1
+            if sync:
+                os.fsync(self._file.fileno())
+                self.metrics["fsyncs"] += 1
+        finally:
+            if self.file_lock is not None:
+                self.file_lock.release()
+
+    def flush(self, sync: bool = False):
+        """Write out everything appended so far, fsyncing it if `sync`."""
+        self._commit(self._appended_seq, sync)
+
+    def ensure_readable(self, position: int):
+        """Flush if the record at `position` is still in the buffer."""
+        if position >= self._written:
+            self.flush()
+
+    def reopen(self):
+        """Reopen the file, e.g. after it was swapped by compaction.
+
+        Must be called while holding `file_lock`, so no write is in flight.
+        """
+        with self._cond:
+            self._file.close()
+            self._file = open(self.file_path, "ab", buffering=0)
+            self._written = self._file.seek(0, os.SEEK_END)
+
+    def _run_interval(self):
+        """fsync every `interval_ms` until closed."""
+        while not self._stop_event.wait(self.interval_ms / 1000):
+            self.flush(sync=True)
+
+    def close(self):
+        """Flush, fsync and close the file."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._file.closed:
+            return
+        self.flush(sync=self.policy != POLICY_NONE)
+        self._file.close()
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from bench_datasets.dataset_cache import load_dataset
+
+    BENCH_FILE_PATH = "group_writer_bench.txt"
+    RECORDS_COUNT = 100_000
+    THREADS_COUNT = 8
+
+    records = []
+    with load_dataset("students", RECORDS_COUNT) as dataset:
+        for name, date, mark, comment in dataset.rows("full_name", "enrollment_date", "mark", "comment"):
+            data = f"{date};{mark};{comment}"
+            records.append(f"{len(name)};{len(data)};{name};{data}")
+
+    def _reset():
+        if os.path.exists(BENCH_FILE_PATH):
+            os.remove(BENCH_FILE_PATH)
+
+    def open_close_per_record():
+        for record in records:
+            with open(BENCH_FILE_PATH, "a", encoding="utf-8") as f_db:
+                f_db.write(record + "\n")
+
+    def with_writer(policy, threads=1, count=RECORDS_COUNT):
+        writer = GroupCommitWriter(BENCH_FILE_PATH, policy=policy)
+        if threads == 1:
+            for record in records[:count]:
+                writer.append(record)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(writer.append, records[:count]))
+        writer.close()
+        return writer.metrics
+
+    def measure(label, func, count=RECORDS_COUNT):
+        _reset()
+        start = time.time()
+        metrics = func()
+        time_taken = time.time() - start
+        print(f"{label}: {time_taken:.6f} s, {int(count / time_taken)} records/s {metrics or ''}")
+
+    print("Group Commit Writer:")
+    measure("open/close per record", open_close_per_record)
+    for policy in (POLICY_NONE, POLICY_EVERY_N, POLICY_INTERVAL):
+        measure(f"writer policy={policy}", lambda: with_writer(policy))
+    # fsync per record is slow, so measure it on a slice of the records
+    ALWAYS_COUNT = 2_000
+    measure("writer policy=always, 1 thread", lambda: with_writer(POLICY_ALWAYS, 1, ALWAYS_COUNT), ALWAYS_COUNT)
+    measure(
+        f"writer policy=always, {THREADS_COUNT} threads",
+        lambda: with_writer(POLICY_ALWAYS, THREADS_COUNT, ALWAYS_COUNT),
+        ALWAYS_COUNT,
+    )
+    _reset()
@@ -1,36 +1,64 @@
 """Select with Hashed Table"""
 
+import atexit
 import os
+import random
 import time
+import zlib
 
 from faker import Faker
 
+from binary_codec import (
+    FORMAT_BINARY, FORMAT_TEXT, encode_line, open_data_file, read_line_at, scan_binary_records,
+)
+from group_writer import GroupCommitWriter, POLICY_NONE
+from record_cache import make_cache, POLICY_ARC
+from record_reader import scan_records
+
 # ==================================================
 # Configs
 # ==================================================
 
-FILE_PATH = "hashed_db.txt"
+FILE_FORMAT = FORMAT_TEXT  # `text` lines or `binary` records, see binary_codec
+FILE_PATH = "hashed_db.bin" if FILE_FORMAT == FORMAT_BINARY else "hashed_db.txt"
+INDEX_FILE_PATH = "hashed_db.idx"
+INDEX_MAGIC = "HASHIDX3"
+CHECK_WINDOW_BYTES = 64 * 1024  # data bytes before the high-water mark checked on load
+INDEX_FLUSH_EVERY = 1_000  # inserts between index flushes
+WRITE_POLICY = POLICY_NONE  # fsync policy, see group_writer.POLICIES
 SEPARATOR = ";"
 hash_table_index = {}
+index_state = {"unflushed": 0}
+
+CACHE_POLICY = POLICY_ARC  # `lru` or `arc`
+CACHE_MAX_BYTES = 1 << 20
+SHARED_READ_HANDLE = True  # keep one read handle instead of reopening per query
+
+open_data_file(FILE_PATH, FILE_FORMAT)
+writer = GroupCommitWriter(FILE_PATH, policy=WRITE_POLICY)
+atexit.register(writer.close)
+record_cache = make_cache(CACHE_POLICY, CACHE_MAX_BYTES)
+read_handle = {"file": None}
 
 # ==================================================
 # Helper Functions
 # ==================================================
 
-def _write_file_db(content: str, file_path: str = FILE_PATH):
+def _write_file_db(content: str):
     """Write to file db."""
-    with open(file_path, "a", encoding="utf-8") as f_db:
-        position = f_db.tell()  # Get the file position before writing
-        f_db.write(content + "\n")  # Add newline after each record
-    return position  # Return the file position for indexing
-
-def _read_file_db(file_path: str = FILE_PATH):
-    """Read from file db."""
-    if not os.path.exists(file_path):
-        print(f"Error: Database `{file_path}` does not exist.")
-        return False
-    with open(file_path, "r", encoding="utf-8") as f_db:
-        return f_db.readlines()
+    if FILE_FORMAT == FORMAT_BINARY:
+        return writer.append_bytes(encode_line(content, SEPARATOR))
+    return writer.append(content)  # Return the file position for indexing
+
+def scan(predicate=None, start_offset: int = 0):
+    """Stream (offset, full_name, data) records from the file db, lazily.
+
+    Stop iterating early to stop reading the file.
+    """
+    writer.flush()
+    if FILE_FORMAT == FORMAT_BINARY:
+        return scan_binary_records(FILE_PATH, predicate, start_offset, SEPARATOR)
+    return scan_records(FILE_PATH, predicate, start_offset, SEPARATOR)
 
 def _format_student_record(full_name, enrollment_date, mark, comment, separator=SEPARATOR):
     """Format the record for operation."""
@@ -39,18 +67,108 @@ def _format_student_record(full_name, enrollment_date, mark, comment, separator=
     data_size = len(data)
     return f"{key_size}{separator}{data_size}{separator}{full_name}{separator}{data}"
 
+def _read_record(f_db, position: int):
+    """Read the record at a byte position of an open file as a text line."""
+    if FILE_FORMAT == FORMAT_BINARY:
+        return read_line_at(f_db, position, SEPARATOR)
+    f_db.seek(position)  # Move to the position in the file
+    return f_db.readline().decode("utf-8").strip()
+
+def _read_line_at(position: int):
+    """Read the record stored at a byte position."""
+    writer.ensure_readable(position)
+    if SHARED_READ_HANDLE:
+        if read_handle["file"] is None:
+            read_handle["file"] = open(FILE_PATH, "rb")
+        return _read_record(read_handle["file"], position)
+    with open(FILE_PATH, "rb") as f_db:
+        return _read_record(f_db, position)
+
+def _replay_data_file(start: int = 0):
+    """Add records written from byte offset `start` onwards to the index."""
+    for pos, key, _ in scan(start_offset=start):
+        hash_table_index[key] = pos
+
 def _build_hash_index():
     """Build the hash table index from file."""
     hash_table_index.clear()
-    if os.path.exists(FILE_PATH):
-        with open(FILE_PATH, "r", encoding="utf-8") as f_db:
-            while True:
-                pos = f_db.tell()
-                line = f_db.readline()
-                if not line:
-                    break
-                _, _, key, *_ = line.strip().split(SEPARATOR)
-                hash_table_index[key] = pos
+    _replay_data_file()
+
+def _data_fingerprint():
+    """(size, inode, mtime_ns) of the data file, zeros if it does not exist."""
+    if not os.path.exists(FILE_PATH):
+        return 0, 0, 0
+    stat = os.stat(FILE_PATH)
+    return stat.st_size, stat.st_ino, stat.st_mtime_ns
+
+def _window_checksum(high_water_mark: int):
+    """CRC32 of the last `CHECK_WINDOW_BYTES` before the high-water mark."""
+    start = max(0, high_water_mark - CHECK_WINDOW_BYTES)
+    if not os.path.exists(FILE_PATH):
+        return 0
+    with open(FILE_PATH, "rb") as f_db:
+        f_db.seek(start)
+        return zlib.crc32(f_db.read(high_water_mark - start))
+
+def _flush_hash_index():
+    """Persist the index with its checksum and a fingerprint of the data it covers."""
+    writer.flush()
+    high_water_mark, inode, mtime_ns = _data_fingerprint()
+    body = "".join(
+        f"{pos}{SEPARATOR}{key}\n" for key, pos in hash_table_index.items()
+    ).encode("utf-8")
+    header = SEPARATOR.join(str(field) for field in (
+        INDEX_MAGIC, high_water_mark, _window_checksum(high_water_mark),
+        inode, mtime_ns, zlib.crc32(body),
+    )) + "\n"
+    tmp_path = INDEX_FILE_PATH + ".tmp"
+    with open(tmp_path, "wb") as f_idx:
+        f_idx.write(header.encode("utf-8") + body)
+    os.replace(tmp_path, INDEX_FILE_PATH)
+    index_state["unflushed"] = 0
+
+def _load_hash_index():
+    """Load the persisted index. Return its high-water mark, or None if unusable.
+
+    Startup must not read the whole data file, so the index is trusted
+    if the data file is the same inode, no shorter than the high-water
+    mark, unmodified if nothing was appended since (mtime), and the
+    `CHECK_WINDOW_BYTES` before the mark are unchanged (CRC32). That
+    catches a replaced, truncated or rewritten file, not just a shorter one.
+    """
+    if not os.path.exists(INDEX_FILE_PATH):
+        return None
+    with open(INDEX_FILE_PATH, "rb") as f_idx:
+        header = f_idx.readline().decode("utf-8").strip().split(SEPARATOR)
+        body = f_idx.read()
+    if len(header) != 6 or header[0] != INDEX_MAGIC:
+        return None
+    high_water_mark, window_crc, inode, mtime_ns, checksum = map(int, header[1:])
+    if zlib.crc32(body) != checksum:
+        return None
+    data_size, data_inode, data_mtime_ns = _data_fingerprint()
+    if high_water_mark > data_size:
+        return None  # Data file was truncated
+    if data_inode != inode:
+        return None  # Data file was replaced
+    if data_size == high_water_mark and data_mtime_ns != mtime_ns:
+        return None  # Rewritten in place without growing
+    if _window_checksum(high_water_mark) != window_crc:
+        return None  # Bytes before the mark changed
+    hash_table_index.clear()
+    for line in body.decode("utf-8").splitlines():
+        pos, key = line.split(SEPARATOR, 1)
+        hash_table_index[key] = int(pos)
+    return high_water_mark
+
+def _open_hash_index():
+    """Load the persisted index and replay only the data written after it."""
+    high_water_mark = _load_hash_index()
+    if high_water_mark is None:
+        _build_hash_index()
+    else:
+        _replay_data_file(high_water_mark)
+    _flush_hash_index()
 
 # ==================================================
 # Insert and Select with Hash Table Index
@@ -64,6 +182,10 @@ def insert_student_hash(full_name, enrollment_date, mark, comment):
     record = _format_student_record(full_name, enrollment_date, mark, comment)
     position = _write_file_db(record)  # Write to file and get position
     hash_table_index[full_name] = position  # Update the hash index
+    record_cache.invalidate(full_name)
+    index_state["unflushed"] += 1
+    if index_state["unflushed"] >= INDEX_FLUSH_EVERY:
+        _flush_hash_index()
     # print(f"Student {full_name} inserted successfully at position {position}.")
 
 def select_student_hash(full_name):
@@ -71,10 +193,11 @@ def select_student_hash(full_name):
     if full_name not in hash_table_index:
         # print(f"Error: Student {full_name} not found in index.")
         return None
-    pos = hash_table_index[full_name]
-    with open(FILE_PATH, "r", encoding="utf-8") as f_db:
-        f_db.seek(pos)  # Move to the position in the file
-        return f_db.readline().strip()
+    record = record_cache.get(full_name)
+    if record is None:
+        record = _read_line_at(hash_table_index[full_name])
+        record_cache.put(full_name, record)
+    return record
 
 # ==================================================
 # Performance Measurement
@@ -82,7 +205,8 @@ def select_student_hash(full_name):
 
 fake = Faker()
 
-_build_hash_index()
+_open_hash_index()
+atexit.register(_flush_hash_index)
 
 def measure_performance_hash():
     """Measure performance of insert and select with hash table index."""
@@ -90,9 +214,11 @@ def measure_performance_hash():
     operations_count = 10_000
     insert_time_avg = 0
     read_time_avg = 0
+    names = []
 
     for _ in range(operations_count):
         name = fake.name()
+        names.append(name)
         date = fake.date()
         mark = fake.random_int()
         comment = fake.sentence()
@@ -102,9 +228,6 @@ def measure_performance_hash():
         insert_student_hash(name, date, mark, comment)
         insert_time_avg += time.time() - i_time
 
-        # Rebuild the sorted array index
-        _build_hash_index()
-
         # Select students
         r_start = time.time()
         select_student_hash(name)
@@ -118,6 +241,15 @@ def measure_performance_hash():
     read_time_taken = f"{read_time_avg:.10f}"
     print(f"select time taken for {operations_count} operations: {read_time_taken} s")
 
+    # Hot reads: a small set of names read repeatedly
+    hot_names = random.sample(names, 100)
+    h_start = time.time()
+    for _ in range(operations_count):
+        select_student_hash(random.choice(hot_names))
+    hot_time_avg = round((time.time() - h_start)/operations_count, 6)
+    print(f"hot select time taken for {operations_count} operations: {hot_time_avg:.10f} s")
+    print(f"{CACHE_POLICY} cache hit rate: {record_cache.hit_rate():.2%} {record_cache.stats}")
+
 # ==================================================
 # Testing Hash Table Indexing
 # ==================================================
@@ -0,0 +1,495 @@
+"""Select with LSM Tree (memtable + SSTables + leveled compaction)"""
+
+import bisect
+import heapq
+import json
+import os
+import time
+
+from bloom_filter import BloomFilter
+from bplus_tree import BPlusTree
+from write_ahead_log import WriteAheadLog
+
+# ==================================================
+# Configs
+# ==================================================
+
+DIR_PATH = "lsm_db"
+SEPARATOR = ";"
+MEMTABLE_BYTES = 1 << 20  # flush the memtable to an SSTable beyond this
+SPARSE_EVERY = 16  # one sparse index entry per this many records
+L0_TABLES_LIMIT = 4  # compact level 0 into level 1 at this many tables
+LEVEL_BASE_BYTES = 4 << 20  # level 1 size limit; each deeper level is 10x larger
+LEVEL_FANOUT = 10
+TABLE_TARGET_BYTES = 2 << 20  # compaction output is split into tables of this size
+BLOOM_FP_RATE = 0.01
+WAL_FSYNC = False
+
+# ==================================================
+# Record Helpers
+# ==================================================
+
+def _format_student_record(full_name, enrollment_date, mark, comment, separator=SEPARATOR):
+    """Format the record for operation."""
+    data = f"{enrollment_date}{separator}{mark}{separator}{comment}"
+    return f"{len(full_name)}{separator}{len(data)}{separator}{full_name}{separator}{data}"
+
+def _format_tombstone(full_name, separator=SEPARATOR):
+    """Format a delete marker, a record with data_size 0."""
+    return f"{len(full_name)}{separator}0{separator}{full_name}{separator}"
+
+def _is_tombstone(record: str, separator=SEPARATOR):
+    """True if the record is a delete marker."""
+    return record.split(separator, 2)[1] == "0"
+
+def _record_key(record: str, separator=SEPARATOR):
+    """Key of a `key_size;data_size;key;data` record."""
+    key_size, _, rest = record.split(separator, 2)
+    return rest[:int(key_size)]
+
+def _tagged(table, age: int):
+    """Yield (key, age, record) of a table, so merged ties go to the lowest (newest) age."""
+    for key, record in table.items():
+        yield key, age, record
+
+# ==================================================
+# SSTable
+# ==================================================
+
+class SSTable:
+    """Immutable file of records sorted by key, with a sparse index and a Bloom filter.
+
+    `<name>.sst` holds the record lines, `<name>.idx` every
+    SPARSE_EVERY-th key with its offset, `<name>.bloom` the filter.
+    A lookup checks the filter, bisects the sparse index and reads at
+    most SPARSE_EVERY lines.
+    """
+
+    def __init__(self, dir_path: str, name: str):
+        self.name = name
+        self.path = os.path.join(dir_path, name)
+        with open(self.path + ".idx", "r", encoding="utf-8") as f_idx:
+            meta = json.load(f_idx)
+        self.sparse_keys = [key for key, _ in meta["sparse"]]
+        self.sparse_offsets = [offset for _, offset in meta["sparse"]]
+        self.min_key = meta["min_key"]
+        self.max_key = meta["max_key"]
+        self.size = meta["size"]
+        self.bloom = BloomFilter.load(self.path + ".bloom")
+
+    @classmethod
+    def write(cls, dir_path: str, name: str, records, count_hint: int):
+        """Write sorted (key, record) pairs. Return (table, bytes written)."""
+        path = os.path.join(dir_path, name)
+        bloom = BloomFilter(max(count_hint, 1), BLOOM_FP_RATE)
+        sparse = []
+        min_key = max_key = None
+        with open(path + ".sst", "wb") as f_sst:
+            for i, (key, record) in enumerate(records):
+                if i % SPARSE_EVERY == 0:
+                    sparse.append([key, f_sst.tell()])
+                f_sst.write((record + "\n").encode("utf-8"))
+                bloom.add(key)
+                min_key = key if min_key is None else min_key
+                max_key = key
+            size = f_sst.tell()
+        with open(path + ".idx", "w", encoding="utf-8") as f_idx:
+            json.dump({"sparse": sparse, "min_key": min_key, "max_key": max_key, "size": size}, f_idx)
+        bloom.save(path + ".bloom")
+        written = size + os.path.getsize(path + ".idx") + os.path.getsize(path + ".bloom")
+        return cls(dir_path, name), written
+
+    def get(self, key: str):
+        """Return the record for `key` (possibly a tombstone), or None."""
+        if self.min_key is None or not self.min_key <= key <= self.max_key:
+            return None
+        if self.bloom is not None and key not in self.bloom:
+            return None
+        i = bisect.bisect_right(self.sparse_keys, key) - 1
+        if i < 0:
+            return None
+        with open(self.path + ".sst", "rb") as f_sst:
+            f_sst.seek(self.sparse_offsets[i])
+            for _ in range(SPARSE_EVERY):
+                line = f_sst.readline()
+                if not line:
+                    return None
+                record = line.decode("utf-8").rstrip("\n")
+                found = _record_key(record)
+                if found == key:
+                    return record
+                if found > key:
+                    return None
+        return None
+
+    def items(self):
+        """Yield every (key, record) in key order."""
+        with open(self.path + ".sst", "rb") as f_sst:
+            for line in f_sst:
+                record = line.decode("utf-8").rstrip("\n")
+                yield _record_key(record), record
+
+    def remove_files(self):
+        """Delete the table's files."""
+        for suffix in (".sst", ".idx", ".bloom"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+# ==================================================
+# LSM Tree
+# ==================================================
+
+class LSMTree:
+    """Log-structured merge tree over a directory.
+
+    Writes go to a WAL and a sorted in-memory memtable. A full memtable is
+    flushed as a level 0 SSTable; level 0 tables may overlap, deeper
+    levels are sorted runs of non-overlapping tables. When a level is over
+    its limit its tables are merged into the next level (leveled
+    compaction), newest version per key winning and tombstones dropped at
+    the bottom level. Reads check the memtable, then each level top-down.
+    """
+
+    def __init__(
+        self, dir_path: str = DIR_PATH,
+        memtable_limit: int = MEMTABLE_BYTES, level_base_bytes: int = LEVEL_BASE_BYTES,
+    ):
+        self.dir_path = dir_path
+        self.memtable_limit = memtable_limit
+        self.level_base_bytes = level_base_bytes
+        os.makedirs(dir_path, exist_ok=True)
+        self.manifest_path = os.path.join(dir_path, "MANIFEST")
+        self.metrics = {"user_bytes": 0, "disk_bytes_written": 0, "flushes": 0, "compactions": 0}
+        self.levels = [[]]  # levels[0] newest first, levels[1:] sorted by min_key
+        self.level_min_keys = [[]]  # min_key of each table per level, for bisecting
+        self.next_seq = 0
+        self._load_manifest()
+
+        self.memtable = BPlusTree()
+        self.memtable_bytes = 0
+        self.lsn = 0
+        self.wal = WriteAheadLog(os.path.join(dir_path, "memtable.wal"), sync=WAL_FSYNC)
+        valid_end = 0
+        for lsn, payload, valid_end in self.wal.entries():
+            self._put_memtable(payload.decode("utf-8"))
+            self.lsn = lsn
+        self.wal.truncate(valid_end)  # Drop a torn entry left by a crash
+
+    # ==================================================
+    # Manifest
+    # ==================================================
+
+    def _load_manifest(self):
+        """Open the tables listed in the manifest."""
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f_manifest:
+            manifest = json.load(f_manifest)
+        self.next_seq = manifest["next_seq"]
+        self.levels = [[SSTable(self.dir_path, name) for name in level] for level in manifest["levels"]]
+        self._refresh_min_keys()
+
+    def _refresh_min_keys(self):
+        """Recompute `level_min_keys` after the levels changed."""
+        self.level_min_keys = [[table.min_key for table in level] for level in self.levels]
+
+    def _save_manifest(self):
+        """Atomically record which tables make up each level."""
+        manifest = {
+            "next_seq": self.next_seq,
+            "levels": [[table.name for table in level] for level in self.levels],
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f_manifest:
+            json.dump(manifest, f_manifest)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _new_table_name(self, level: int):
+        self.next_seq += 1
+        return f"L{level}_{self.next_seq:06d}"
+
+    # ==================================================
+    # Writes
+    # ==================================================
+
+    def _put_memtable(self, record: str):
+        key = _record_key(record)
+        previous = self.memtable.get(key)
+        self.memtable.insert(key, record)
+        self.memtable_bytes += len(record) - (len(previous) if previous is not None else 0)
+
+    def put(self, record: str):
+        """Log and buffer one record (or tombstone)."""
+        self.lsn += 1
+        payload = record.encode("utf-8")
+        self.wal.append(self.lsn, payload)
+        self.metrics["user_bytes"] += len(payload) + 1
+        self.metrics["disk_bytes_written"] += len(payload) + 16  # WAL entry header
+        self._put_memtable(record)
+        if self.memtable_bytes >= self.memtable_limit:
+            self.flush()
+
+    def flush(self):
+        """Write the memtable as a new level 0 SSTable and empty the WAL."""
+        if not len(self.memtable):
+            return
+        table, written = SSTable.write(
+            self.dir_path, self._new_table_name(0), self.memtable.items(), len(self.memtable)
+        )
+        self.metrics["disk_bytes_written"] += written
+        self.metrics["flushes"] += 1
+        self.levels[0].insert(0, table)
+        self._save_manifest()
+        self.memtable = BPlusTree()
+        self.memtable_bytes = 0
+        self.wal.truncate(0)
+        self._maybe_compact()
+
+    # ==================================================
+    # Leveled Compaction
+    # ==================================================
+
+    def _level_limit(self, level: int):
+        return self.level_base_bytes * LEVEL_FANOUT ** (level - 1)
+
+    def _maybe_compact(self):
+        """Compact levels until every level is within its limit."""
+        if len(self.levels[0]) >= L0_TABLES_LIMIT:
+            self._compact(0, list(self.levels[0]))
+        level = 1
+        while level < len(self.levels):
+            while sum(table.size for table in self.levels[level]) > self._level_limit(level):
+                self._compact(level, [self.levels[level][0]])
+            level += 1
+
+    def _compact(self, level: int, inputs):
+        """Merge `inputs` from `level` with the overlapping tables of the next level."""
+        if level + 1 >= len(self.levels):
+            self.levels.append([])
+        min_key = min(table.min_key for table in inputs)
+        max_key = max(table.max_key for table in inputs)
+        overlapping = [
+            table for table in self.levels[level + 1]
+            if not (table.max_key < min_key or table.min_key > max_key)
+        ]
+        bottom = all(not tables for tables in self.levels[level + 2:])
+
+        # Newer tables first: inputs from `level` (already newest first), then the next level
+        sources = inputs + overlapping
+        streams = [_tagged(table, age) for age, table in enumerate(sources)]
+
+        def merged():
+            previous = None
+            for key, _, record in heapq.merge(*streams):
+                if key == previous:
+                    continue  # Older version of a key already emitted
+                previous = key
+                if bottom and _is_tombstone(record):
+                    continue  # Nothing below to shadow, drop the delete marker
+                yield key, record
+
+        outputs = []
+        batch, batch_bytes = [], 0
+        for key, record in merged():
+            batch.append((key, record))
+            batch_bytes += len(record) + 1
+            if batch_bytes >= TABLE_TARGET_BYTES:
+                outputs.append(self._write_table(level + 1, batch))
+                batch, batch_bytes = [], 0
+        if batch:
+            outputs.append(self._write_table(level + 1, batch))
+
+        for table in inputs:
+            self.levels[level].remove(table)
+        kept = [table for table in self.levels[level + 1] if table not in overlapping]
+        self.levels[level + 1] = sorted(kept + outputs, key=lambda table: table.min_key)
+        self._refresh_min_keys()
+        self._save_manifest()
+        for table in sources:
+            table.remove_files()
+        self.metrics["compactions"] += 1
+
+    def _write_table(self, level: int, batch):
+        table, written = SSTable.write(self.dir_path, self._new_table_name(level), batch, len(batch))
+        self.metrics["disk_bytes_written"] += written
+        return table
+
+    # ==================================================
+    # Reads
+    # ==================================================
+
+    def get(self, key: str):
+        """Return the latest live record for `key`, or None."""
+        record = self.memtable.get(key)
+        if record is None:
+            record = self._get_from_tables(key)
+        if record is None or _is_tombstone(record):
+            return None
+        return record
+
+    def _get_from_tables(self, key: str):
+        for table in self.levels[0]:
+            record = table.get(key)
+            if record is not None:
+                return record
+        for level, min_keys in zip(self.levels[1:], self.level_min_keys[1:]):
+            i = bisect.bisect_right(min_keys, key) - 1
+            if i >= 0:
+                record = level[i].get(key)
+                if record is not None:
+                    return record
+        return None
+
+    # ==================================================
+    # Metrics
+    # ==================================================
+
+    def write_amplification(self):
+        """Bytes written to disk per byte of records written by the user."""
+        if not self.metrics["user_bytes"]:
+            return 0.0
+        return self.metrics["disk_bytes_written"] / self.metrics["user_bytes"]
+
+    def space_used(self):
+        """Bytes on disk: SSTables, their indexes and filters, and the WAL."""
+        return sum(
+            os.path.getsize(os.path.join(self.dir_path, name)) for name in os.listdir(self.dir_path)
+        )
+
+    def close(self):
+        """Flush the memtable and close the WAL."""
+        self.flush()
+        self.wal.close()
+
+# ==================================================
+# Insert, Update and Select with LSM Tree
+# ==================================================
+
+lsm = None  # opened by `open_lsm`
+
+def open_lsm(dir_path: str = DIR_PATH):
+    """Open (or recover) the LSM tree used by the functions below."""
+    global lsm
+    lsm = LSMTree(dir_path)
+    return lsm
+
+def insert_student_lsm(full_name, enrollment_date, mark, comment):
+    """Insert student if not exists."""
+    if lsm.get(full_name) is not None:
+        return None
+    lsm.put(_format_student_record(full_name, enrollment_date, mark, comment))
+
+def update_student_lsm(full_name, enrollment_date, mark, comment):
+    """Update student if exists. The new version shadows the old one."""
+    if lsm.get(full_name) is not None:
+        lsm.put(_format_student_record(full_name, enrollment_date, mark, comment))
+
+def delete_student_lsm(full_name):
+    """Delete student by writing a tombstone."""
+    lsm.put(_format_tombstone(full_name))
+
+def select_student_lsm(full_name):
+    """Select student by full_name."""
+    return lsm.get(full_name)
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+def measure_performance_lsm(operations_count: int = 10_000):
+    """Measure performance of insert and select with LSM tree."""
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from bench_datasets.dataset_cache import load_dataset
+
+    with load_dataset("students", operations_count) as dataset:
+        students = list(dataset.rows("full_name", "enrollment_date", "mark", "comment"))
+    insert_time_avg = 0
+    read_time_avg = 0
+    names = []
+
+    for name, date, mark, comment in students:
+        names.append(name)
+
+        i_start = time.time()
+        insert_student_lsm(name, date, mark, comment)
+        insert_time_avg += time.time() - i_start
+
+        r_start = time.time()
+        select_student_lsm(name)
+        read_time_avg += time.time() - r_start
+
+    # Every other student takes the next student's data
+    for i in range(0, len(students), 2):
+        update_student_lsm(names[i], *students[(i + 1) % len(students)][1:])
+
+    insert_time_avg = round(insert_time_avg/operations_count, 6)
+    print(f"insert time taken for {operations_count} operations: {insert_time_avg:.10f} s")
+    read_time_avg = round(read_time_avg/operations_count, 6)
+    print(f"select time taken for {operations_count} operations: {read_time_avg:.10f} s")
+
+    lsm.flush()
+    c_start = time.time()
+    for name in names:
+        select_student_lsm(name)
+    cold_time_avg = round((time.time() - c_start)/operations_count, 6)
+    print(f"select from SSTables for {operations_count} operations: {cold_time_avg:.10f} s")
+    print(
+        f"write amplification: {lsm.write_amplification():.2f}\tspace: {lsm.space_used()} bytes"
+        f"\tlevels: {[len(level) for level in lsm.levels]}\t{lsm.metrics}"
+    )
+
+def check_against_dict(operations_count: int = 3_000, seed: int = 0, dir_path: str = DIR_PATH + "_check"):
+    """Run random inserts/updates/deletes on a tiny LSM tree and compare every read with a dict.
+
+    Small memtable and level limits force many flushes and compactions.
+    Return the number of mismatches.
+    """
+    import random
+    import shutil
+
+    if os.path.exists(dir_path):
+        shutil.rmtree(dir_path)
+    rng = random.Random(seed)
+    tree = LSMTree(dir_path, memtable_limit=2_000, level_base_bytes=8_000)
+    model = {}
+    mismatches = 0
+    try:
+        for i in range(operations_count):
+            key = f"n{rng.randrange(500):04d}"
+            if rng.random() < 0.2:
+                tree.put(_format_tombstone(key))
+                model.pop(key, None)
+            else:
+                record = _format_student_record(key, "2022-07-30", i, f"op {i}")
+                tree.put(record)
+                model[key] = record
+            probe = f"n{rng.randrange(500):04d}"
+            if tree.get(probe) != model.get(probe):
+                mismatches += 1
+        mismatches += sum(1 for key in (f"n{k:04d}" for k in range(500)) if tree.get(key) != model.get(key))
+        print(
+            f"dict model check: {operations_count} random ops, {tree.metrics['compactions']} compactions,"
+            f" {mismatches} mismatches"
+        )
+    finally:
+        tree.wal.close()
+        shutil.rmtree(dir_path)
+    return mismatches
+
+def check():
+    """Fail if the LSM tree disagrees with the dict model. Run before timing anything."""
+    if check_against_dict():
+        raise AssertionError("LSM tree reads disagree with the dict model")
+
+if __name__ == "__main__":
+    import shutil
+
+    check()
+    if os.path.exists(DIR_PATH):
+        shutil.rmtree(DIR_PATH)
+    open_lsm()
+    print("LSM Tree:")
+    measure_performance_lsm(100_000)
+    lsm.close()
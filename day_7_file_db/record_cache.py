@@ -0,0 +1,191 @@
+"""Byte-bounded record caches (LRU and ARC) with hit-rate metrics"""
+
+from collections import OrderedDict
+
+# ==================================================
+# Configs
+# ==================================================
+
+DEFAULT_MAX_BYTES = 1 << 20  # 1 MB
+POLICY_LRU = "lru"
+POLICY_ARC = "arc"
+
+def _default_size(key, value):
+    """Approximate entry size: characters of key and value."""
+    return len(key) + len(value)
+
+# ==================================================
+# LRU
+# ==================================================
+
+class LRUCache:
+    """Evict the least recently used records once `max_bytes` is exceeded."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, size_of=_default_size):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._entries = OrderedDict()  # key -> (value, size)
+
+    def get(self, key):
+        """Return the cached value, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """Cache a value, evicting old entries to stay within `max_bytes`."""
+        size = self.size_of(key, value)
+        self._discard(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def _discard(self, key):
+        """Drop a key if cached. Return True if it was."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= entry[1]
+        return True
+
+    def invalidate(self, key):
+        """Forget a key after its record changed."""
+        if self._discard(key):
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        """Forget every cached key, e.g. after the data file was deleted."""
+        self._entries.clear()
+        self.bytes = 0
+
+    def hit_rate(self):
+        """Fraction of lookups served from the cache."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+# ==================================================
+# ARC
+# ==================================================
+
+class ARCCache(LRUCache):
+    """Adaptive Replacement Cache, sized in bytes.
+
+    `t1` holds keys seen once recently, `t2` keys seen at least twice.
+    `b1`/`b2` remember (without values) keys recently evicted from each.
+    A hit in a ghost list moves the target size `p` of `t1` towards the
+    side that would have kept the key, so the cache adapts between
+    recency-heavy and frequency-heavy workloads.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, size_of=_default_size):
+        super().__init__(max_bytes, size_of)
+        self.p = 0  # target bytes for t1
+        self.t1, self.t2 = OrderedDict(), OrderedDict()  # key -> (value, size)
+        self.b1, self.b2 = OrderedDict(), OrderedDict()  # key -> size
+        self._bytes = {"t1": 0, "t2": 0, "b1": 0, "b2": 0}
+
+    def get(self, key):
+        """Return the cached value, or None on a miss."""
+        if key in self.t1:
+            value, size = self.t1.pop(key)
+            self._bytes["t1"] -= size
+            self.t2[key] = (value, size)
+            self._bytes["t2"] += size
+        elif key in self.t2:
+            self.t2.move_to_end(key)
+        else:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return self.t2[key][0]
+
+    def put(self, key, value):
+        """Cache a value, adapting `p` when the key is a ghost hit."""
+        size = self.size_of(key, value)
+        cached = self._discard(key)
+        if size > self.max_bytes:
+            return
+        in_b2 = False
+        if key in self.b1:
+            delta = max(size, size * self._bytes["b2"] // max(self._bytes["b1"], 1))
+            self.p = min(self.max_bytes, self.p + delta)
+            self._bytes["b1"] -= self.b1.pop(key)
+        elif key in self.b2:
+            delta = max(size, size * self._bytes["b1"] // max(self._bytes["b2"], 1))
+            self.p = max(0, self.p - delta)
+            self._bytes["b2"] -= self.b2.pop(key)
+            in_b2 = True
+        elif not cached:
+            self._replace(False, size)
+            self.t1[key] = (value, size)
+            self._bytes["t1"] += size
+            self._trim_ghosts()
+            self.bytes = self._bytes["t1"] + self._bytes["t2"]
+            return
+
+        # Seen before: a refreshed record or a ghost hit goes to t2
+        self._replace(in_b2, size)
+        self.t2[key] = (value, size)
+        self._bytes["t2"] += size
+        self._trim_ghosts()
+        self.bytes = self._bytes["t1"] + self._bytes["t2"]
+
+    def _replace(self, in_b2: bool, incoming: int):
+        """Evict from t1 or t2 into the ghost lists until `incoming` fits."""
+        while self._bytes["t1"] + self._bytes["t2"] + incoming > self.max_bytes:
+            t1_bytes = self._bytes["t1"]
+            if self.t1 and (t1_bytes > self.p or (in_b2 and t1_bytes >= self.p) or not self.t2):
+                key, (_, size) = self.t1.popitem(last=False)
+                self._bytes["t1"] -= size
+                self.b1[key] = size
+                self._bytes["b1"] += size
+            else:
+                key, (_, size) = self.t2.popitem(last=False)
+                self._bytes["t2"] -= size
+                self.b2[key] = size
+                self._bytes["b2"] += size
+            self.stats["evictions"] += 1
+
+    def _trim_ghosts(self):
+        """Keep t1 + b1 within `max_bytes` and everything within twice that."""
+        while self.b1 and self._bytes["t1"] + self._bytes["b1"] > self.max_bytes:
+            self._bytes["b1"] -= self.b1.popitem(last=False)[1]
+        while self.b2 and sum(self._bytes.values()) > 2 * self.max_bytes:
+            self._bytes["b2"] -= self.b2.popitem(last=False)[1]
+
+    def clear(self):
+        """Forget every cached and ghost key."""
+        for entries in (self.t1, self.t2, self.b1, self.b2):
+            entries.clear()
+        self._bytes = {"t1": 0, "t2": 0, "b1": 0, "b2": 0}
+        self.bytes = 0
+        self.p = 0
+
+    def _discard(self, key):
+        """Drop a cached key from t1 or t2. Return True if it was cached."""
+        for name, entries in (("t1", self.t1), ("t2", self.t2)):
+            entry = entries.pop(key, None)
+            if entry is not None:
+                self._bytes[name] -= entry[1]
+                self.bytes = self._bytes["t1"] + self._bytes["t2"]
+                return True
+        return False
+
+def make_cache(policy: str = POLICY_ARC, max_bytes: int = DEFAULT_MAX_BYTES, size_of=_default_size):
+    """Create a cache for a policy name."""
+    if policy == POLICY_LRU:
+        return LRUCache(max_bytes, size_of)
+    if policy == POLICY_ARC:
+        return ARCCache(max_bytes, size_of)
+    raise ValueError(f"Unknown cache policy `{policy}`, use `{POLICY_LRU}` or `{POLICY_ARC}`.")
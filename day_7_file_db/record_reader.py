@@ -0,0 +1,261 @@
+"""Readers for `key_size;data_size;key;data` record files"""
+
+import mmap
+import os
+
+# ==================================================
+# Configs
+# ==================================================
+
+SEPARATOR = ";"
+SCAN_CHUNK_SIZE = 64 * 1024  # bytes read per call when streaming records
+
+# ==================================================
+# Reader
+# ==================================================
+
+class MmapRecordReader:
+    """Walk a record file through `mmap` without decoding every line.
+
+    Key lookups search the raw bytes for `;key;` and then check the
+    `key_size` prefix of the surrounding record, so the scan runs at
+    `memchr` speed and only the matching record is ever decoded. The
+    `data_size` prefix tells tombstones (size 0) apart from live records.
+    """
+
+    def __init__(self, file_path: str, separator: str = SEPARATOR):
+        self.file_path = file_path
+        self.separator = separator.encode("utf-8")
+        self._file = None
+        self._mm = None
+        self._view = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        """Map the file as it is right now. Later appends need a reopen."""
+        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
+            return self
+        self._file = open(self.file_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        return self
+
+    def close(self):
+        """Release the mapping."""
+        if self._view is not None:
+            self._view.release()
+            self._mm.close()
+            self._file.close()
+        self._file = self._mm = self._view = None
+
+    def _record_start(self, hit: int, key_chars: int):
+        """Validate that the `;key;` found at `hit` is a record key.
+
+        Return (offset, is_tombstone) of its record, or None when the bytes
+        matched somewhere else, e.g. inside a comment.
+        """
+        mm = self._mm
+        sep = self.separator
+        offset = mm.rfind(b"\n", 0, hit) + 1
+        size_end = mm.find(sep, offset, hit)
+        if size_end < 0 or mm.find(sep, size_end + 1, hit + 1) != hit:
+            return None
+        try:
+            if int(mm[offset:size_end]) != key_chars:
+                return None
+            return offset, int(mm[size_end + 1:hit]) == 0
+        except ValueError:
+            return None
+
+    def read_at(self, offset: int):
+        """Decode the record line starting at `offset`."""
+        end = self._mm.find(b"\n", offset)
+        if end < 0:
+            end = len(self._mm)
+        return bytes(self._view[offset:end]).decode("utf-8")
+
+    def find_first(self, full_name: str):
+        """Return the offset of the first record for `full_name`, or None."""
+        if self._mm is None:
+            return None
+        needle = self.separator + full_name.encode("utf-8") + self.separator
+        hit = self._mm.find(needle)
+        while hit >= 0:
+            found = self._record_start(hit, len(full_name))
+            if found is not None:
+                return found[0]
+            hit = self._mm.find(needle, hit + 1)
+        return None
+
+    def find_latest(self, full_name: str):
+        """Return (offset, is_tombstone) of the last record for `full_name`, or None.
+
+        Searches backwards from the end of the file with `rfind`, so the
+        latest version is found without walking the records before it.
+        """
+        if self._mm is None:
+            return None
+        needle = self.separator + full_name.encode("utf-8") + self.separator
+        end = len(self._mm)
+        while True:
+            hit = self._mm.rfind(needle, 0, end)
+            if hit < 0:
+                return None
+            found = self._record_start(hit, len(full_name))
+            if found is not None:
+                return found
+            end = hit + len(needle) - 1
+
+# ==================================================
+# Streaming Scan
+# ==================================================
+
+def scan_records(
+        file_path: str,
+        predicate=None,
+        start_offset: int = 0,
+        separator: str = SEPARATOR,
+        chunk_size: int = SCAN_CHUNK_SIZE,
+    ):
+    """Lazily yield (offset, key, data) for records from `start_offset` on.
+
+    The file is read in `chunk_size` blocks and split into lines, so memory
+    stays flat however large the file is. `data` is "" for a tombstone.
+    Only records for which `predicate(record)` is true are yielded; the
+    caller can stop iterating as soon as it has its answer.
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "rb") as f_db:
+        f_db.seek(start_offset)
+        offset = start_offset
+        pending = b""
+        while True:
+            chunk = f_db.read(chunk_size)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()  # Carried over to the next chunk
+            for line in lines:
+                record = _parse_record(line, offset, separator)
+                offset += len(line) + 1
+                if record is not None and (predicate is None or predicate(record)):
+                    yield record
+        record = _parse_record(pending, offset, separator) if pending else None
+        if record is not None and (predicate is None or predicate(record)):
+            yield record
+
+def _parse_record(line: bytes, offset: int, separator: str):
+    """Return (offset, key, data) of a raw line, or None if it is malformed."""
+    try:
+        key_size, _, rest = line.decode("utf-8").split(separator, 2)
+        key_size = int(key_size)
+    except ValueError:
+        return None
+    return offset, rest[:key_size], rest[key_size + 1:].rstrip("\r")
+
+# ==================================================
+# Reverse Scan
+# ==================================================
+
+REVERSE_BLOCK_SIZE = 8 * 1024  # bytes read per step when scanning from EOF
+
+def reverse_scan_records(
+        file_path: str,
+        predicate=None,
+        end_offset: int = None,
+        separator: str = SEPARATOR,
+        block_size: int = REVERSE_BLOCK_SIZE,
+        contains: bytes = None,
+    ):
+    """Lazily yield (offset, key, data) from the end of the file backwards.
+
+    Fixed-size blocks are read from `end_offset` (default EOF) towards the
+    start; the first, possibly partial, line of a block is carried over and
+    completed by the block before it. The newest records come first, so a
+    "latest version" lookup stops after touching only the tail. Blocks
+    without the raw bytes `contains` are skipped without decoding.
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "rb") as f_db:
+        position = f_db.seek(0, os.SEEK_END) if end_offset is None else end_offset
+        carry = b""  # Start of the line cut by the previous block boundary
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f_db.seek(position)
+            block = f_db.read(read_size) + carry
+            if contains is not None and contains not in block:
+                first_newline = block.find(b"\n")
+                carry = block if first_newline < 0 else block[:first_newline]
+                continue
+            lines = block.split(b"\n")
+            carry = lines[0]
+            # lines[1:] are complete; the one after the last newline may be empty
+            offset = position + len(block)
+            for line in reversed(lines[1:]):
+                offset -= len(line) + 1
+                if not line:
+                    continue
+                record = _parse_record(line, offset + 1, separator)
+                if record is not None and (predicate is None or predicate(record)):
+                    yield record
+        if carry:
+            record = _parse_record(carry, 0, separator)
+            if record is not None and (predicate is None or predicate(record)):
+                yield record
+
+def find_latest_record(file_path: str, full_name: str, separator: str = SEPARATOR):
+    """Return (offset, key, data) of the newest record for `full_name`, or None."""
+    needle = f"{separator}{full_name}{separator}".encode("utf-8")
+    matches = reverse_scan_records(
+        file_path,
+        lambda record: record[1] == full_name,
+        separator=separator,
+        contains=needle,
+    )
+    return next(matches, None)
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    BENCH_FILE_PATH = sys.argv[1] if len(sys.argv) > 1 else "file_db.txt"
+    records = list(scan_records(BENCH_FILE_PATH))
+    print(f"Latest-version lookup in `{BENCH_FILE_PATH}` ({len(records)} records):")
+
+    def _time(func, repeat=20):
+        start = time.time()
+        for _ in range(repeat):
+            func()
+        return (time.time() - start) / repeat
+
+    for label, record in (("tail", records[-5]), ("middle", records[len(records) // 2]), ("head", records[3])):
+        name = record[1]
+
+        def forward():
+            latest = None
+            for latest in scan_records(BENCH_FILE_PATH, lambda found: found[1] == name):
+                pass
+            return latest
+
+        def mmap_rfind():
+            with MmapRecordReader(BENCH_FILE_PATH) as reader:
+                return reader.find_latest(name)
+
+        print(
+            f"{label}:\tforward scan {_time(forward):.6f} s"
+            f"\treverse blocks {_time(lambda: find_latest_record(BENCH_FILE_PATH, name)):.6f} s"
+            f"\tmmap rfind {_time(mmap_rfind):.6f} s"
+        )
@@ -0,0 +1,141 @@
+"""Secondary indexes on non-key student fields"""
+
+import os
+
+from binary_codec import FORMAT_BINARY, FORMAT_TEXT, scan_binary_records
+from bplus_tree import BPlusTree, DEFAULT_ORDER
+from compaction import parse_key
+
+# ==================================================
+# Configs
+# ==================================================
+
+SEPARATOR = ";"
+# Indexable fields: position in the `date;mark;comment` data and value type
+FIELDS = {
+    "enrollment_date": (0, str),
+    "mark": (1, int),
+}
+
+# ==================================================
+# Record Helpers
+# ==================================================
+
+def field_values(data: str, fields, separator: str = SEPARATOR):
+    """Return {field: value} of a record's `date;mark;comment` data."""
+    values = data.split(separator, 2)
+    return {field: FIELDS[field][1](values[FIELDS[field][0]]) for field in fields}
+
+def parse_fields(line: str, fields, separator: str = SEPARATOR):
+    """Return (key, {field: value}) of a record line, or (key, None) for a tombstone."""
+    key, tombstone = parse_key(line, separator)
+    if tombstone:
+        return key, None
+    data = line.rstrip("\n").split(separator, 2)[2][len(key) + 1:]
+    return key, field_values(data, fields, separator)
+
+# ==================================================
+# Secondary Index
+# ==================================================
+
+class SecondaryIndex:
+    """Map the values of one field to the offsets of live records holding them.
+
+    Several records can share a value, so the B+-tree key is the pair
+    `[value, offset]`; a range of values is then a single leaf scan.
+    """
+
+    def __init__(self, field: str, order: int = DEFAULT_ORDER):
+        if field not in FIELDS:
+            raise ValueError(f"Cannot index `{field}`, use one of {tuple(FIELDS)}.")
+        self.field = field
+        self.tree = BPlusTree(order)
+
+    def __len__(self):
+        return len(self.tree)
+
+    def add(self, value, offset: int):
+        """Index the record at `offset`."""
+        self.tree.insert([value, offset], None)
+
+    def remove(self, value, offset: int):
+        """Drop the record at `offset`, e.g. when a newer version replaces it."""
+        return self.tree.delete([value, offset])
+
+    def range(self, start=None, end=None):
+        """Yield offsets of records with `start <= value < end`, in value order."""
+        start_key = None if start is None else [start]
+        end_key = None if end is None else [end]
+        for (_, offset), _ in self.tree.range(start_key, end_key):
+            yield offset
+
+    def equal(self, value):
+        """Yield offsets of records whose value is exactly `value`."""
+        for (found, offset), _ in self.tree.range([value]):
+            if found != value:
+                return
+            yield offset
+
+    # ==================================================
+    # Persistence
+    # ==================================================
+
+    def save(self, file_path: str, data_size: int):
+        """Write the index with the data file length it covers."""
+        self.tree.meta = {"field": self.field, "data_size": data_size}
+        self.tree.save(file_path)
+
+    @classmethod
+    def load(cls, file_path: str, field: str, data_size: int):
+        """Read a saved index. Return None if missing or not covering `data_size` bytes.
+
+        Updates remove older versions from the index, which a tail replay
+        cannot do without the old values, so a stale index is rebuilt.
+        """
+        if not os.path.exists(file_path):
+            return None
+        try:
+            tree = BPlusTree.load(file_path)
+        except ValueError:
+            return None
+        if tree.meta.get("field") != field or tree.meta.get("data_size") != data_size:
+            return None
+        index = cls(field, tree.order)
+        index.tree = tree
+        return index
+
+def build_secondary_indexes(
+        file_path: str,
+        fields,
+        separator: str = SEPARATOR,
+        file_format: str = FORMAT_TEXT,
+    ):
+    """Scan a data file once and bulk load an index per field from its live records."""
+    latest = {}
+    if file_format == FORMAT_BINARY:
+        for offset, key, data in scan_binary_records(file_path, separator=separator):
+            if data:
+                latest[key] = (offset, field_values(data, fields, separator))
+            else:
+                latest.pop(key, None)
+    elif os.path.exists(file_path):
+        with open(file_path, "rb") as f_db:
+            next_offset = 0
+            for line in f_db:
+                offset, next_offset = next_offset, next_offset + len(line)
+                try:
+                    key, values = parse_fields(line.decode("utf-8"), fields, separator)
+                except (ValueError, IndexError):
+                    continue  # Malformed line, e.g. a torn last write
+                if values is None:
+                    latest.pop(key, None)
+                else:
+                    latest[key] = (offset, values)
+
+    indexes = {}
+    for field in fields:
+        index = SecondaryIndex(field)
+        entries = sorted([values[field], offset] for offset, values in latest.values())
+        index.tree = BPlusTree.bulk_load(((entry, None) for entry in entries), index.tree.order)
+        indexes[field] = index
+    return indexes
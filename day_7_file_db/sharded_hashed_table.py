@@ -0,0 +1,184 @@
+"""Select with Sharded Hashed Table"""
+
+import os
+import time
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from compaction import Compactor
+from group_writer import GroupCommitWriter, POLICY_NONE
+
+# ==================================================
+# Configs
+# ==================================================
+
+SHARDS_COUNT = 8
+FILE_PATH_TEMPLATE = "sharded_db_{shard}.txt"
+WRITE_POLICY = POLICY_NONE  # fsync policy, see group_writer.POLICIES
+SEPARATOR = ";"
+
+shards = []  # one {"index", "writer", "compactor"} dict per shard
+
+# ==================================================
+# Helper Functions
+# ==================================================
+
+def _shard_path(shard: int):
+    """File path of a shard."""
+    return FILE_PATH_TEMPLATE.format(shard=shard)
+
+def _shard_for(full_name: str, shards_count: int):
+    """Route a key to a shard. crc32 is stable across processes, unlike hash()."""
+    return zlib.crc32(full_name.encode("utf-8")) % shards_count
+
+def _format_student_record(full_name, enrollment_date, mark, comment, separator=SEPARATOR):
+    """Format the record for operation."""
+    data = f"{enrollment_date}{separator}{mark}{separator}{comment}"
+    return f"{len(full_name)}{separator}{len(data)}{separator}{full_name}{separator}{data}"
+
+def _build_shard_index(file_path: str):
+    """Build one shard's hash index. Runs in a worker process."""
+    index = {}
+    if os.path.exists(file_path):
+        with open(file_path, "rb") as f_db:
+            pos = 0
+            for line in f_db:
+                key_size, _, rest = line.decode("utf-8").split(SEPARATOR, 2)
+                index[rest[:int(key_size)]] = pos
+                pos += len(line)
+    return index
+
+def _build_shard_index_packed(file_path: str):
+    """Build a shard index and pack it as (newline-joined keys, offsets array).
+
+    Pickling one string and one array back to the parent is far cheaper
+    than pickling a dict with an entry per record.
+    """
+    index = _build_shard_index(file_path)
+    return "\n".join(index), array("q", index.values())
+
+def build_shard_indexes(shards_count: int = SHARDS_COUNT, parallel: bool = True):
+    """Build every shard index, one worker process per shard when `parallel`."""
+    paths = [_shard_path(shard) for shard in range(shards_count)]
+    if not parallel or shards_count == 1:
+        return [_build_shard_index(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=shards_count) as pool:
+        return [
+            dict(zip(keys.split("\n"), offsets)) if keys else {}
+            for keys, offsets in pool.map(_build_shard_index_packed, paths)
+        ]
+
+def open_shards(shards_count: int = SHARDS_COUNT, parallel: bool = True):
+    """Rebuild the indexes and open a writer and compactor per shard."""
+    close_shards()
+    for shard, index in enumerate(build_shard_indexes(shards_count, parallel)):
+        state = {"index": index}
+
+        def _on_swap(new_index, state=state):
+            # Records still buffered in the writer missed the tail copy; they
+            # land after the compacted data, shifted by the size difference
+            old_end = state["writer"].written_size
+            state["writer"].reopen()
+            shift = state["writer"].written_size - old_end
+            for key, pos in state["index"].items():
+                if pos >= old_end:
+                    new_index[key] = pos + shift
+            state["index"] = new_index
+
+        state["compactor"] = Compactor(_shard_path(shard), SEPARATOR, on_swap=_on_swap)
+        state["writer"] = GroupCommitWriter(
+            _shard_path(shard), policy=WRITE_POLICY, lock=state["compactor"].lock
+        )
+        shards.append(state)
+
+def close_shards():
+    """Flush and close every shard writer."""
+    for state in shards:
+        state["writer"].close()
+    shards.clear()
+
+def compact_shard(shard: int):
+    """Compact one shard file. Return the number of reclaimed bytes."""
+    shards[shard]["writer"].flush()
+    return shards[shard]["compactor"].compact()
+
+# ==================================================
+# Insert and Select with Sharded Hash Table Index
+# ==================================================
+
+def insert_student_sharded(full_name, enrollment_date, mark, comment):
+    """Insert student into its shard and update that shard's index."""
+    state = shards[_shard_for(full_name, len(shards))]
+    if full_name in state["index"]:
+        return None
+    record = _format_student_record(full_name, enrollment_date, mark, comment)
+    state["index"][full_name] = state["writer"].append(record)
+
+def select_student_sharded(full_name):
+    """Select student by full_name using its shard's hash index."""
+    state = shards[_shard_for(full_name, len(shards))]
+    pos = state["index"].get(full_name)
+    if pos is None:
+        return None
+    state["writer"].ensure_readable(pos)
+    with open(state["writer"].file_path, "rb") as f_db:
+        f_db.seek(pos)
+        return f_db.readline().decode("utf-8").strip()
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+def _remove_shard_files(shards_count: int):
+    """Delete the shard files of a layout."""
+    for shard in range(shards_count):
+        if os.path.exists(_shard_path(shard)):
+            os.remove(_shard_path(shard))
+
+def measure_rebuild(records, shard_counts):
+    """Measure index rebuild time vs. shard count on the same records."""
+    for shards_count in shard_counts:
+        open_shards(shards_count, parallel=False)
+        for full_name, enrollment_date, mark, comment in records:
+            insert_student_sharded(full_name, enrollment_date, mark, comment)
+        close_shards()
+
+        s_start = time.time()
+        build_shard_indexes(shards_count, parallel=False)
+        sequential_time = round(time.time() - s_start, 6)
+
+        p_start = time.time()
+        build_shard_indexes(shards_count, parallel=True)
+        parallel_time = round(time.time() - p_start, 6)
+
+        print(
+            f"shards: {shards_count}\tsequential rebuild: {sequential_time:.6f} s"
+            f"\tparallel rebuild: {parallel_time:.6f} s"
+        )
+        _remove_shard_files(shards_count)
+
+if __name__ == "__main__":
+    from faker import Faker
+
+    fake = Faker()
+    RECORDS_COUNT = 1_000_000
+    SHARD_COUNTS = [1, 2, 4, 8]
+
+    # Faker is too slow for 1M rows, so combine a pool of Faker values
+    first_names = [fake.first_name() for _ in range(1_000)]
+    last_names = [fake.last_name() for _ in range(1_000)]
+    dates = [fake.date() for _ in range(1_000)]
+    sentences = [fake.sentence() for _ in range(1_000)]
+    records = [
+        (
+            f"{first_names[i % 1_000]} {last_names[(i // 1_000) % 1_000]} {i}",
+            dates[(i * 7) % 1_000],
+            i % 10_000,
+            sentences[i % 1_000],
+        )
+        for i in range(RECORDS_COUNT)
+    ]
+
+    print(f"Sharded Hashed File DB ({RECORDS_COUNT} records, {os.cpu_count()} CPUs):")
+    measure_rebuild(records, SHARD_COUNTS)
@@ -1,19 +1,45 @@
 """Select with sorted tuple"""
 
+import atexit
+import heapq
 import os
+import random
+import tempfile
 import time
-import bisect
 
 from faker import Faker
 
-FILE_PATH = "sorted_db.txt"
+from binary_codec import (
+    FORMAT_BINARY, FORMAT_TEXT, encode_line, open_data_file, read_line_at, scan_binary_records,
+)
+from bplus_tree import BPlusTree
+from group_writer import GroupCommitWriter, POLICY_NONE
+from record_cache import make_cache, POLICY_ARC
+from record_reader import scan_records
+
+FILE_FORMAT = FORMAT_TEXT  # `text` lines or `binary` records, see binary_codec
+FILE_PATH = "sorted_db.bin" if FILE_FORMAT == FORMAT_BINARY else "sorted_db.txt"
 SEPARATOR = ";"
+WRITE_POLICY = POLICY_NONE  # fsync policy, see group_writer.POLICIES
+
+CACHE_POLICY = POLICY_ARC  # `lru` or `arc`
+CACHE_MAX_BYTES = 1 << 20
+SHARED_READ_HANDLE = True  # keep one read handle instead of reopening per query
+
+open_data_file(FILE_PATH, FILE_FORMAT)
+writer = GroupCommitWriter(FILE_PATH, policy=WRITE_POLICY)
+atexit.register(writer.close)
+record_cache = make_cache(CACHE_POLICY, CACHE_MAX_BYTES)
+read_handle = {"file": None}
 
 # ==================================================
-# Configs for Sorted List Indexing
+# Configs for B+-tree Indexing
 # ==================================================
 
-sorted_array_index = []
+INDEX_FILE_PATH = "sorted_db.idx"
+PERSIST_INDEX = True  # Save the index to INDEX_FILE_PATH on exit
+BULK_RUN_SIZE = 100_000  # records sorted in memory before spilling a run to disk
+sorted_index = BPlusTree()
 
 # ==================================================
 # Helper Functions
@@ -28,19 +54,21 @@ def _delete_file_db(file_path: str = FILE_PATH):
     print(f"Database `{file_path}` deleted successfully.")
     return True
 
-def _write_file_db(content: str, file_path: str = FILE_PATH):
+def _write_file_db(content: str):
     """Write to file db."""
-    with open(file_path, "a", encoding="utf-8") as f_db:
-        f_db.write(content + "\n")
-        return True
+    if FILE_FORMAT == FORMAT_BINARY:
+        return writer.append_bytes(encode_line(content, SEPARATOR))
+    return writer.append(content)  # Return the file position for indexing
 
-def _read_file_db(file_path: str = FILE_PATH):
-    """Read from file db."""
-    if not os.path.exists(file_path):
-        print(f"Error: Database `{file_path}` does not exists.")
-        return False
-    with open(file_path, "r", encoding="utf-8") as f_db:
-        return f_db.readlines()
+def scan(predicate=None, start_offset: int = 0):
+    """Stream (offset, full_name, data) records from the file db, lazily.
+
+    Stop iterating early to stop reading the file.
+    """
+    writer.flush()
+    if FILE_FORMAT == FORMAT_BINARY:
+        return scan_binary_records(FILE_PATH, predicate, start_offset, SEPARATOR)
+    return scan_records(FILE_PATH, predicate, start_offset, SEPARATOR)
 
 def _format_student_record(
         full_name: str,
@@ -57,45 +85,176 @@ def _format_student_record(
     data_size = len(data)
     return f"{key_size}{separator}{data_size}{separator}{key}{separator}{data}"
 
-def _build_sorted_array_index():
-    """Build the sorted array index from file."""
-    sorted_array_index.clear()
-    if os.path.exists(FILE_PATH):
-        with open(FILE_PATH, "r", encoding="utf-8") as f_db:
-            while True:
-                pos = f_db.tell()
-                line = f_db.readline()
-                if not line:
-                    break
-                _, _, key, *_ = line.strip().split(SEPARATOR)
-                bisect.insort(sorted_array_index, (key, pos))  # Keep the array sorted
+def _read_record(f_db, position: int):
+    """Read the record at a byte position of an open file as a text line."""
+    if FILE_FORMAT == FORMAT_BINARY:
+        return read_line_at(f_db, position, SEPARATOR)
+    f_db.seek(position)  # Move to position in file
+    return f_db.readline().decode("utf-8").strip()
+
+def _read_line_at(position: int):
+    """Read the record stored at a byte position."""
+    writer.ensure_readable(position)
+    if SHARED_READ_HANDLE:
+        if read_handle["file"] is None:
+            read_handle["file"] = open(FILE_PATH, "rb")
+        return _read_record(read_handle["file"], position)
+    with open(FILE_PATH, "rb") as f_db:
+        return _read_record(f_db, position)
+
+def _build_sorted_index():
+    """Build the B+-tree index from file."""
+    sorted_index.clear()
+    for pos, key, _ in scan():
+        sorted_index.insert(key, pos)
+
+def _save_sorted_index():
+    """Persist the index as a page file, tagged with the data file size."""
+    writer.flush()
+    sorted_index.meta = {"data_size": os.path.getsize(FILE_PATH) if os.path.exists(FILE_PATH) else 0}
+    sorted_index.save(INDEX_FILE_PATH)
+
+def _load_sorted_index():
+    """Load the persisted index. Return None if missing, damaged or not matching the data file."""
+    if not os.path.exists(INDEX_FILE_PATH):
+        return None
+    try:
+        loaded = BPlusTree.load(INDEX_FILE_PATH)
+    except ValueError:
+        return None  # Truncated, partially written or not a page file
+    data_size = os.path.getsize(FILE_PATH) if os.path.exists(FILE_PATH) else 0
+    if loaded.meta.get("data_size") != data_size:
+        return None
+    return loaded
+
+def _open_sorted_index():
+    """Load the persisted index if it matches the data file, else rebuild it."""
+    global sorted_index
+    loaded = _load_sorted_index() if PERSIST_INDEX else None
+    if loaded is None:
+        _build_sorted_index()
+    else:
+        sorted_index = loaded
 
 # ==================================================
-# Insert and Select with Sorted Array Index
+# Insert and Select with B+-tree Index
 # ==================================================
 
 def insert_student_sorted(full_name, enrollment_date, mark, comment):
-    """Insert student and update sorted array index."""
-    idx = [name for name, _ in sorted_array_index]
-    if full_name in idx:
+    """Insert student and update B+-tree index."""
+    if full_name in sorted_index:
         # print(f"Error: Student {full_name} already exists in sorted index.")
         return None
     record = _format_student_record(full_name, enrollment_date, mark, comment)
     position = _write_file_db(record)  # Write to file and get position
-    bisect.insort(sorted_array_index, (full_name, position))  # Insert in sorted order
+    sorted_index.insert(full_name, position)  # Insert in sorted order
+    record_cache.invalidate(full_name)
     # print(f"Student {full_name} inserted successfully at position {position}.")
 
 def select_student_sorted(full_name):
-    """Select student by full_name using binary search over sorted array."""
-    idx = [name for name, _ in sorted_array_index]
-    pos = bisect.bisect_left(idx, full_name)
-    if pos != len(sorted_array_index) and sorted_array_index[pos][0] == full_name:
-        with open(FILE_PATH, "r", encoding="utf-8") as f_db:
-            f_db.seek(sorted_array_index[pos][1])  # Move to position in file
-            return f_db.readline().strip()
-    else:
+    """Select student by full_name using the B+-tree index."""
+    position = sorted_index.get(full_name)
+    if position is None:
         # print(f"Error: Student {full_name} not found in sorted index.")
         return None
+    record = record_cache.get(full_name)
+    if record is None:
+        record = _read_line_at(position)
+        record_cache.put(full_name, record)
+    return record
+
+def select_students_prefix(prefix):
+    """Select students whose full_name starts with `prefix`, in name order."""
+    for _, position in sorted_index.prefix(prefix):
+        yield _read_line_at(position)
+
+def select_students_range(start=None, end=None):
+    """Select students with `start <= full_name < end`, in name order."""
+    for _, position in sorted_index.range(start, end):
+        yield _read_line_at(position)
+
+# ==================================================
+# Bulk Loading with External Merge Sort
+# ==================================================
+
+def _record_key(line: str):
+    """Key of a `key_size;data_size;key;data` line."""
+    key_size, _, rest = line.split(SEPARATOR, 2)
+    return rest[:int(key_size)]
+
+def _spill_sorted_runs(students, run_size: int, run_dir: str):
+    """Sort the students in chunks of `run_size`, spilling each chunk to a run file.
+
+    Return the sorted lines of the last chunk, still in memory, and the run file paths.
+    """
+    runs = []
+    chunk = []
+    for full_name, enrollment_date, mark, comment in students:
+        chunk.append(_format_student_record(full_name, enrollment_date, mark, comment) + "\n")
+        if len(chunk) >= run_size:
+            chunk.sort(key=_record_key)
+            fd, run_path = tempfile.mkstemp(suffix=".run", dir=run_dir)
+            with open(fd, "w", encoding="utf-8") as f_run:
+                f_run.writelines(chunk)
+            runs.append(run_path)
+            chunk = []
+    chunk.sort(key=_record_key)
+    return chunk, runs
+
+def bulk_load_file(
+        students,
+        file_path: str,
+        run_size: int = BULK_RUN_SIZE,
+        file_format: str = FORMAT_TEXT,
+    ):
+    """Append students to `file_path` in key order and return their B+-tree index.
+
+    Memory holds one run of `run_size` records; sorted runs are k-way
+    merged with `heapq.merge`, and each merged record is written and
+    handed to `BPlusTree.bulk_load` in the same pass. The first of
+    several records with the same name wins, like `insert_student_sorted`.
+    Runs are always text; records are encoded on write in `file_format`.
+    """
+    open_data_file(file_path, file_format)
+    run_dir = os.path.dirname(os.path.abspath(file_path))
+    last_chunk, runs = _spill_sorted_runs(students, run_size, run_dir)
+    run_files = [open(run_path, "r", encoding="utf-8") for run_path in runs]
+    try:
+        merged = heapq.merge(*run_files, last_chunk, key=_record_key)
+        with open(file_path, "ab") as f_db:
+            position = f_db.tell()
+
+            def entries():
+                nonlocal position
+                previous = None
+                for line in merged:
+                    key = _record_key(line)
+                    if key == previous:
+                        continue
+                    previous = key
+                    if file_format == FORMAT_BINARY:
+                        data = encode_line(line, SEPARATOR)
+                    else:
+                        data = line.encode("utf-8")
+                    f_db.write(data)
+                    yield key, position
+                    position += len(data)
+
+            return BPlusTree.bulk_load(entries())
+    finally:
+        for f_run, run_path in zip(run_files, runs):
+            f_run.close()
+            os.remove(run_path)
+
+def bulk_load_students(students, run_size: int = BULK_RUN_SIZE):
+    """Load an iterator of (full_name, enrollment_date, mark, comment) into an empty DB."""
+    global sorted_index
+    if len(sorted_index):
+        raise ValueError("Bulk load needs an empty database, use insert_student_sorted.")
+    writer.flush()
+    sorted_index = bulk_load_file(students, FILE_PATH, run_size, FILE_FORMAT)
+    writer.reopen()
+    return len(sorted_index)
 
 # ==================================================
 # Performance Measurement
@@ -103,17 +262,21 @@ def select_student_sorted(full_name):
 
 fake = Faker()
 
-_build_sorted_array_index()
+_open_sorted_index()
+if PERSIST_INDEX:
+    atexit.register(_save_sorted_index)
 
 def measure_performance_sorted():
-    """Measure performance of insert and select with sorted array index."""
+    """Measure performance of insert and select with B+-tree index."""
 
     operations_count = 10_000
     insert_time_avg = 0
     read_time_avg = 0
+    names = []
 
     for _ in range(operations_count):
         name = fake.name()
+        names.append(name)
         date = fake.date()
         mark = fake.random_int()
         comment = fake.sentence()
@@ -123,9 +286,6 @@ def measure_performance_sorted():
         insert_student_sorted(name, date, mark, comment)
         insert_time_avg += time.time() - i_time
 
-        # Rebuild the sorted array index
-        _build_sorted_array_index()
-
         # Select students
         r_start = time.time()
         select_student_sorted(name)
@@ -139,7 +299,63 @@ def measure_performance_sorted():
     read_time_taken = f"{read_time_avg:.10f}"
     print(f"select time taken for {operations_count} operations: {read_time_taken} s")
 
+    # Hot reads: a small set of names read repeatedly
+    hot_names = random.sample(names, 100)
+    h_start = time.time()
+    for _ in range(operations_count):
+        select_student_sorted(random.choice(hot_names))
+    hot_time_avg = round((time.time() - h_start)/operations_count, 6)
+    print(f"hot select time taken for {operations_count} operations: {hot_time_avg:.10f} s")
+    print(f"{CACHE_POLICY} cache hit rate: {record_cache.hit_rate():.2%} {record_cache.stats}")
+
+    p_start = time.time()
+    thomas_count = sum(1 for _ in select_students_prefix("Thomas"))
+    p_time = round(time.time() - p_start, 6)
+    print(f"prefix select of {thomas_count} `Thomas` students: {p_time:.10f} s")
+
+def measure_bulk_load(records_count: int = 200_000, run_size: int = 50_000):
+    """Compare one insert per student against the external merge sort bulk load."""
+    bench_path = "sorted_bulk_db.txt"
+
+    # Faker is too slow for this many rows, so combine a pool of Faker values
+    first_names = [fake.first_name() for _ in range(1_000)]
+    last_names = [fake.last_name() for _ in range(1_000)]
+    dates = [fake.date() for _ in range(1_000)]
+    sentences = [fake.sentence() for _ in range(1_000)]
+
+    def students():
+        for i in range(records_count):
+            yield (
+                f"{first_names[(i * 7919) % 1_000]} {last_names[i % 1_000]} {i}",
+                dates[i % 1_000],
+                i % 10_000,
+                sentences[(i * 31) % 1_000],
+            )
+
+    if os.path.exists(bench_path):
+        os.remove(bench_path)
+    i_start = time.time()
+    index = BPlusTree()
+    bench_writer = GroupCommitWriter(bench_path, policy=WRITE_POLICY)
+    for full_name, enrollment_date, mark, comment in students():
+        if full_name not in index:
+            record = _format_student_record(full_name, enrollment_date, mark, comment)
+            index.insert(full_name, bench_writer.append(record))
+    bench_writer.close()
+    insert_time = round(time.time() - i_start, 6)
+    os.remove(bench_path)
+
+    b_start = time.time()
+    index = bulk_load_file(students(), bench_path, run_size)
+    bulk_time = round(time.time() - b_start, 6)
+    os.remove(bench_path)
+
+    runs_count = records_count // run_size
+    print(f"load {records_count} students one insert each: {insert_time:.6f} s")
+    print(f"bulk load {len(index)} students ({runs_count} spilled runs): {bulk_time:.6f} s")
+
 # ==================================================
-# Testing Sorted Array Indexing
+# Testing B+-tree Indexing
 # ==================================================
 measure_performance_sorted()
+measure_bulk_load()
@@ -0,0 +1,174 @@
+"""Fault-injection harness and throughput numbers for the write-ahead log
+
+    python wal_fault_injection.py
+
+Each round starts a writer process that appends records through a
+`LoggedFile` and prints the id of every record once `append` returned,
+kills it with SIGKILL at a random moment, sometimes appends a torn WAL
+entry or a half-written record on top, then recovers and checks that
+every committed record is in the data file and every line is intact.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import time
+
+from write_ahead_log import LoggedFile, ENTRY_HEADER
+
+# ==================================================
+# Configs
+# ==================================================
+
+FILE_PATH = "wal_fault_db.txt"
+COMMITTED_PATH = "wal_fault_db.committed"  # writer stdout, read after the kill
+SEPARATOR = ";"
+ROUNDS = 20
+MAX_RUN_SECONDS = 0.3  # writer is killed after a random time up to this
+CHECKPOINT_EVERY = 500
+THROUGHPUT_COUNT = 2_000
+
+# ==================================================
+# Helper Functions
+# ==================================================
+
+def _format_record(record_id: int):
+    """Format a `key_size;data_size;key;data` line for a record id."""
+    key = f"Student {record_id}"
+    data = f"2022-07-30{SEPARATOR}{record_id % 100}{SEPARATOR}Comment {record_id}"
+    return f"{len(key)}{SEPARATOR}{len(data)}{SEPARATOR}{key}{SEPARATOR}{data}\n"
+
+def _remove_files():
+    """Delete the data file, WAL and checkpoint."""
+    if os.path.exists(COMMITTED_PATH):
+        os.remove(COMMITTED_PATH)
+    for suffix in ("", ".wal", ".ckpt"):
+        if os.path.exists(FILE_PATH + suffix):
+            os.remove(FILE_PATH + suffix)
+
+def _read_keys():
+    """Return the keys in the data file, raising if a line is torn or malformed."""
+    keys = set()
+    with open(FILE_PATH, "rb") as f_db:
+        for line in f_db:
+            text = line.decode("utf-8")
+            key_size, data_size, rest = text.split(SEPARATOR, 2)
+            if not text.endswith("\n") or len(rest) != int(key_size) + 1 + int(data_size) + 1:
+                raise ValueError(f"Torn record: {text!r}")
+            keys.add(rest[:int(key_size)])
+    return keys
+
+# ==================================================
+# Writer Process
+# ==================================================
+
+def run_writer(first_id: int):
+    """Append records forever, reporting each id after it is committed."""
+    logged = LoggedFile(FILE_PATH, sync=False, checkpoint_every=CHECKPOINT_EVERY)
+    record_id = first_id
+    while True:
+        logged.append(_format_record(record_id).encode("utf-8"))
+        sys.stdout.write(f"{record_id}\n")
+        sys.stdout.flush()
+        record_id += 1
+
+# ==================================================
+# Fault Injection
+# ==================================================
+
+def _inject_torn_write():
+    """Leave a half-written WAL entry and/or a half-written data record."""
+    record = _format_record(10**9).encode("utf-8")
+    if random.random() < 0.5:
+        entry = ENTRY_HEADER.pack(0, len(record), 10**9) + record
+        with open(FILE_PATH + ".wal", "ab") as f_wal:
+            f_wal.write(entry[:random.randint(1, len(entry) - 1)])
+    if random.random() < 0.5:
+        with open(FILE_PATH, "ab") as f_db:
+            f_db.write(record[:random.randint(1, len(record) - 1)])
+
+def run_round(first_id: int):
+    """Kill a writer at a random point, recover and verify. Return the next free id."""
+    # A file instead of a pipe, so a full pipe never blocks the writer
+    with open(COMMITTED_PATH, "w", encoding="utf-8") as f_out:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--writer", str(first_id)],
+            stdout=f_out,
+        )
+        time.sleep(random.uniform(0.05, MAX_RUN_SECONDS))
+        proc.kill()
+        proc.wait()
+    with open(COMMITTED_PATH, "r", encoding="utf-8") as f_out:
+        committed = [int(line) for line in f_out.read().split("\n")[:-1]]
+
+    if random.random() < 0.5:
+        _inject_torn_write()
+
+    logged = LoggedFile(FILE_PATH, sync=False, checkpoint_every=CHECKPOINT_EVERY)
+    metrics = dict(logged.metrics)
+    logged.close()
+
+    keys = _read_keys()
+    lost = [record_id for record_id in committed if f"Student {record_id}" not in keys]
+    status = "OK" if not lost else f"LOST {len(lost)}"
+    print(
+        f"committed: {len(committed)}\treplayed: {metrics['replayed']}"
+        f"\tdiscarded bytes: {metrics['discarded_bytes']}\t{status}"
+    )
+    if lost:
+        raise AssertionError(f"Committed records lost after recovery: {lost[:10]}")
+    return committed[-1] + 1 if committed else first_id
+
+# ==================================================
+# Throughput
+# ==================================================
+
+def measure_throughput(count: int = THROUGHPUT_COUNT):
+    """Records/s of rewriting the file per update vs. appending with and without WAL."""
+    records = [_format_record(record_id) for record_id in range(count)]
+
+    def rewrite_per_update():
+        lines = []
+        for record in records:
+            lines.append(record)
+            with open(FILE_PATH, "w", encoding="utf-8") as f_db:
+                f_db.writelines(lines)
+
+    def plain_append():
+        with open(FILE_PATH, "ab", buffering=0) as f_db:
+            for record in records:
+                f_db.write(record.encode("utf-8"))
+
+    def wal_append(sync: bool):
+        logged = LoggedFile(FILE_PATH, sync=sync)
+        for record in records:
+            logged.append(record.encode("utf-8"))
+        logged.close()
+
+    for label, func in (
+            ("rewrite file per update", rewrite_per_update),
+            ("append, no WAL", plain_append),
+            ("append with WAL, no fsync", lambda: wal_append(False)),
+            ("append with WAL, fsync per commit", lambda: wal_append(True)),
+        ):
+        _remove_files()
+        start = time.time()
+        func()
+        time_taken = time.time() - start
+        print(f"{label}: {time_taken:.6f} s, {int(count / time_taken)} records/s")
+    _remove_files()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--writer":
+        run_writer(int(sys.argv[2]))
+
+    _remove_files()
+    print("WAL fault injection:")
+    next_id = 0
+    for _ in range(ROUNDS):
+        next_id = run_round(next_id)
+    _remove_files()
+
+    print(f"\nWAL throughput ({THROUGHPUT_COUNT} records):")
+    measure_throughput()
@@ -0,0 +1,222 @@
+"""Write-ahead log and crash recovery for append-only file DBs"""
+
+import os
+import struct
+import threading
+import zlib
+
+# ==================================================
+# Configs
+# ==================================================
+
+WAL_SUFFIX = ".wal"
+CHECKPOINT_SUFFIX = ".ckpt"
+# crc32 of (lsn + payload), payload length, log sequence number
+ENTRY_HEADER = struct.Struct("<IIQ")
+# last applied lsn, data file size, data file inode
+CHECKPOINT = struct.Struct("<QQQ")
+CHECKPOINT_EVERY = 1_000  # appends between checkpoints
+
+# ==================================================
+# Write-Ahead Log
+# ==================================================
+
+class WriteAheadLog:
+    """Append-only log of checksummed entries.
+
+    An entry is committed once `append` returns: it has been written (and
+    fsynced when `sync`) as one `write` call. A crash can only leave a
+    torn entry at the very end, which `entries` detects by its checksum.
+    """
+
+    def __init__(self, file_path: str, sync: bool = True):
+        self.file_path = file_path
+        self.sync = sync
+        self._file = open(file_path, "ab", buffering=0)
+
+    def append(self, lsn: int, payload: bytes):
+        """Write one entry and, if `sync`, fsync it before returning."""
+        lsn_bytes = struct.pack("<Q", lsn)
+        crc = zlib.crc32(lsn_bytes + payload)
+        self._file.write(ENTRY_HEADER.pack(crc, len(payload), lsn) + payload)
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def entries(self):
+        """Yield (lsn, payload, end_offset) of intact entries, stopping at a torn one."""
+        with open(self.file_path, "rb") as f_wal:
+            data = f_wal.read()
+        pos = 0
+        while pos + ENTRY_HEADER.size <= len(data):
+            crc, length, lsn = ENTRY_HEADER.unpack_from(data, pos)
+            start = pos + ENTRY_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(struct.pack("<Q", lsn) + payload) != crc:
+                return
+            pos = start + length
+            yield lsn, payload, pos
+
+    def truncate(self, size: int = 0):
+        """Cut the log to `size` bytes, dropping a torn tail or applied entries."""
+        self._file.truncate(size)
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """Close the log file."""
+        self._file.close()
+
+# ==================================================
+# Logged File
+# ==================================================
+
+class LoggedFile:
+    """Append-only data file whose appends are logged first.
+
+    `append` writes the record to the WAL, then to the data file. Every
+    `checkpoint_every` appends the data file is fsynced and a checkpoint
+    `(lsn, data size, inode)` is saved, after which the WAL is emptied.
+
+    Recovery cuts the data file back to the checkpointed size, dropping any
+    half-written record, and re-applies every intact WAL entry after the
+    checkpoint lsn. If the inode changed, compaction swapped the file after
+    the checkpoint: the size is then meaningless, so only a torn last line
+    is cut and the entries are re-appended; in a log where the latest
+    version wins, re-appending them again is harmless.
+    """
+
+    def __init__(
+            self,
+            file_path: str,
+            lock=None,
+            sync: bool = True,
+            checkpoint_every: int = CHECKPOINT_EVERY,
+        ):
+        self.file_path = file_path
+        self.wal_path = file_path + WAL_SUFFIX
+        self.checkpoint_path = file_path + CHECKPOINT_SUFFIX
+        self.lock = lock if lock is not None else threading.Lock()
+        self.sync = sync
+        self.checkpoint_every = checkpoint_every
+        self.metrics = {"appends": 0, "checkpoints": 0, "replayed": 0, "discarded_bytes": 0}
+        self._open()
+
+    def _open(self):
+        """Open the files and recover from the last run."""
+        self._data = open(self.file_path, "ab", buffering=0)
+        self.wal = WriteAheadLog(self.wal_path, self.sync)
+        self.lsn = 0
+        self._since_checkpoint = 0
+        self.recover()
+
+    @property
+    def size(self):
+        """Current data file size."""
+        return self._data.tell()
+
+    def _inode(self):
+        return os.fstat(self._data.fileno()).st_ino
+
+    def _read_checkpoint(self):
+        """Return (lsn, size, inode) of the last checkpoint, or None."""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "rb") as f_ckpt:
+            data = f_ckpt.read()
+        if len(data) != CHECKPOINT.size:
+            return None
+        return CHECKPOINT.unpack(data)
+
+    def _trim_torn_line(self):
+        """Cut a trailing record that has no newline, i.e. was half written."""
+        size = self._data.seek(0, os.SEEK_END)
+        with open(self.file_path, "rb") as f_db:
+            f_db.seek(max(0, size - 4096))
+            tail = f_db.read()
+        keep = size - len(tail) + tail.rfind(b"\n") + 1 if b"\n" in tail else max(0, size - len(tail))
+        if keep < size:
+            self._data.truncate(keep)
+            self._data.seek(keep)
+        return size - keep
+
+    def recover(self):
+        """Bring the data file back to the last committed append."""
+        with self.lock:
+            checkpoint = self._read_checkpoint()
+            if checkpoint is not None and checkpoint[2] == self._inode():
+                last_lsn, size, _ = checkpoint
+                current = self._data.seek(0, os.SEEK_END)
+                if current > size:
+                    self._data.truncate(size)
+                    self._data.seek(size)
+                    self.metrics["discarded_bytes"] += current - size
+            else:
+                last_lsn = checkpoint[0] if checkpoint is not None else 0
+                self.metrics["discarded_bytes"] += self._trim_torn_line()
+
+            self.lsn = last_lsn
+            valid_end = 0
+            for lsn, payload, end in self.wal.entries():
+                valid_end = end
+                if lsn <= last_lsn:
+                    continue
+                self._data.write(payload)
+                self.lsn = lsn
+                self.metrics["replayed"] += 1
+            if valid_end < os.path.getsize(self.wal_path):
+                self.metrics["discarded_bytes"] += os.path.getsize(self.wal_path) - valid_end
+                self.wal.truncate(valid_end)
+            self._checkpoint()
+
+    def append(self, payload: bytes):
+        """Log and apply one newline-terminated record. Return its data file offset."""
+        with self.lock:
+            self.lsn += 1
+            self.wal.append(self.lsn, payload)
+            offset = self._data.tell()
+            self._data.write(payload)
+            self.metrics["appends"] += 1
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= self.checkpoint_every:
+                self._checkpoint()
+        return offset
+
+    def _checkpoint(self):
+        """Save a checkpoint and empty the WAL. Caller holds `lock`."""
+        os.fsync(self._data.fileno())
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as f_ckpt:
+            f_ckpt.write(CHECKPOINT.pack(self.lsn, self._data.tell(), self._inode()))
+            f_ckpt.flush()
+            os.fsync(f_ckpt.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+        self.wal.truncate(0)
+        self._since_checkpoint = 0
+        self.metrics["checkpoints"] += 1
+
+    def checkpoint(self):
+        """Save a checkpoint now."""
+        with self.lock:
+            self._checkpoint()
+
+    def reopen(self):
+        """Reopen the data file after compaction swapped it, and checkpoint.
+
+        Must be called while holding `lock`, e.g. from a compactor `on_swap`.
+        """
+        self._data.close()
+        self._data = open(self.file_path, "ab", buffering=0)
+        self._checkpoint()
+
+    def reset(self):
+        """Delete the data file, WAL and checkpoint and start empty."""
+        with self.lock:
+            self.close()
+            for path in (self.file_path, self.wal_path, self.checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._open()
+
+    def close(self):
+        """Close the data file and the WAL."""
+        self._data.close()
+        self.wal.close()
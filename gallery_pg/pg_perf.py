@@ -1,11 +1,12 @@
 """Postgres Performance Testing"""
 
+import os
+import sys
 import time
 import psycopg2
 
-from faker import Faker
-
-fake = Faker()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_datasets.dataset_cache import load_dataset
 
 print("PostgreSQL\n\n")
 
@@ -37,16 +38,17 @@ cursor.execute("""
     TRUNCATE TABLE students RESTART IDENTITY CASCADE;
 """)
 
+# Rows come from the dataset cache, so the timed loops only time Postgres
+RECORDS_COUNT = 100_000
+with load_dataset("students", RECORDS_COUNT) as dataset:
+    students = list(dataset.rows("full_name", "date_of_birth", "nationality"))
+    dates_of_birth = list(dataset.column("date_of_birth"))
+new_dates_of_birth = dates_of_birth[1:] + dates_of_birth[:1]
+
 ### Insert Perf
 #
-RECORDS_COUNT = 100_000
 i_start = time.time()
-for _ in range(RECORDS_COUNT):
-    student = (
-        f"{fake.first_name()} {fake.last_name()}",
-        fake.date_of_birth(minimum_age=15, maximum_age=28),
-        fake.country()
-    )
+for student in students:
     cursor.execute("""
         INSERT INTO students (name, date_of_birth, nationality) VALUES (%s, %s, %s)
     """, student)
@@ -57,13 +59,9 @@ print(
 
 ### Update Perf
 #
-RECORDS_COUNT = 100_000
 u_start = time.time()
 for i in range(RECORDS_COUNT):
-    student = (
-        fake.date_of_birth(minimum_age=15, maximum_age=28),
-        i
-    )
+    student = (new_dates_of_birth[i], i)
     cursor.execute("""
         UPDATE students SET date_of_birth = %s WHERE id = %s
     """, student)
@@ -74,7 +72,6 @@ print(
 
 ### Read Perf
 #
-RECORDS_COUNT = 100_000
 r_start = time.time()
 for i in range(RECORDS_COUNT):
     cursor.execute("""
@@ -1,9 +1,15 @@
 """Postgres Gallery DB Seeder"""
 
+import os
+import sys
 import random
 import psycopg2
 from faker import Faker
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_datasets.dataset_cache import generate_chunks
+from bench_datasets.chunk_pipeline import run_pipeline
+
 # Configs
 
 DB_HOST="localhost"
@@ -19,6 +25,10 @@ gen_count = {
     "visitors": 200,
     "sales": 100_000
 }
+SEED = 42  # sales are reproducible for a given seed and chunk size
+SALES_CHUNK_SIZE = 10_000
+SEED_WORKERS = os.cpu_count()  # processes generating sales
+SALES_QUEUE_SIZE = 4  # chunks waiting to be inserted
 
 # Helpers
 
@@ -43,15 +53,9 @@ def truncate_table_if_exists(table):
 
 fake = Faker()
 
-conn = psycopg2.connect(
-    host=DB_HOST,
-    port=DB_PORT,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    dbname=DB_NAME
-)
-
-cursor = conn.cursor()
+# Connected in `__main__`, so worker processes never open a connection
+conn = None
+cursor = None
 
 # Define Generations
 
@@ -141,34 +145,53 @@ def generate_sales(count = gen_count.get("sales")):
     cursor.execute("SELECT id FROM visitors")
     visitor_ids = [row[0] for row in cursor.fetchall()]
 
-    sales = [
-        (
-            random.choice(artwork_ids),
-            random.choice(visitor_ids),
-            fake.date_this_year(before_today=True, after_today=False).isoformat(),
-            round(random.uniform(100, 5000), 2)
-        )
-        for _ in range(count)
-    ]
-    cursor.executemany("""
-        INSERT INTO sales (artwork_id, visitor_id, sale_date, amount)
-        VALUES (%s, %s, %s, %s)
-    """, sales)
+    conn.commit()
+
+    def write_sales(sales):
+        cursor.executemany("""
+            INSERT INTO sales (artwork_id, visitor_id, sale_date, amount)
+            VALUES (%s, %s, %s, %s)
+        """, sales)
+        conn.commit()
+
+    # Generated in `SEED_WORKERS` processes, each with its own seeded Faker,
+    # and handed through a bounded queue to this thread, which inserts and
+    # commits chunk by chunk while the next chunks are generated
+    metrics = run_pipeline(
+        generate_chunks(
+            "sales", count, SALES_CHUNK_SIZE, SEED, SEED_WORKERS,
+            artwork_ids=artwork_ids, visitor_ids=visitor_ids
+        ),
+        write_sales,
+        SALES_QUEUE_SIZE,
+    )
+    print(f"sales: {metrics['rows']} rows in {metrics['chunks']} chunks, peak queue {metrics['peak_queue']}")
+
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        dbname=DB_NAME
+    )
 
+    cursor = conn.cursor()
 
-# Generation
+    # Generation
 
-generate_artists()
-generate_exhibitions()
-generate_artworks()
-generate_visitors()
-generate_sales()
+    generate_artists()
+    generate_exhibitions()
+    generate_artworks()
+    generate_visitors()
+    generate_sales()
 
-# Commiting
+    # Commiting
 
-conn.commit()
+    conn.commit()
 
-# Closing
+    # Closing
 
-cursor.close()
-conn.close()
+    cursor.close()
+    conn.close()
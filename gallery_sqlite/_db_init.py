@@ -1,10 +1,17 @@
 """Gallery DB Seeder"""
 
-import sqlite3
+import os
+import sys
+import time
 import random
 
 from faker import Faker
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sqlite_perf.sqlite_profiles import connect, PROFILE_DEFAULT
+from bench_datasets.dataset_cache import generate_chunks
+from bench_datasets.chunk_pipeline import run_pipeline
+
 # Configs
 gen_count = {
     "artists": 50,
@@ -13,10 +20,15 @@ gen_count = {
     "visitors": 200,
     "sales": 100_000
 }
+SEED = 42  # sales are reproducible for a given seed and chunk size
+SALES_CHUNK_SIZE = 10_000
+SEED_WORKERS = os.cpu_count()  # processes generating sales
+SALES_QUEUE_SIZE = 4  # chunks waiting to be inserted
 
-# Database Init
-conn = sqlite3.connect('gallery.db')
-cursor = conn.cursor()
+# Database Init (in `__main__`, so worker processes never open or migrate it)
+PRAGMA_PROFILE = PROFILE_DEFAULT  # one of `PROFILES`; "bulk-load" is faster but not crash-safe
+conn = None
+cursor = None
 
 # Migrations
 def migrate():
@@ -80,8 +92,6 @@ def migrate():
         );
     """)
 
-migrate()
-
 # Initialize Faker
 fake = Faker()
 
@@ -152,37 +162,52 @@ def generate_visitors(num = gen_count.get("visitors")):
     """, visitors)
 
 def generate_sales(num = gen_count.get("sales")):
-    """Function to generate random sales data"""
+    """Function to generate random sales data.
+
+    Rows are generated in `SEED_WORKERS` processes, each with its own
+    seeded Faker, and handed through a bounded queue to this thread,
+    which inserts and commits them chunk by chunk while the next chunks
+    are generated.
+    """
     cursor.execute('DELETE FROM sales')
+    conn.commit()
     artwork_ids = [i for i in range(1, gen_count.get("artworks") + 1)]  # Assuming there are 20 artworks
     visitor_ids = [i for i in range(1, gen_count.get("visitors") + 1)]  # Assuming there are 20 visitors
-    sales = [
-        (
-            random.choice(artwork_ids),
-            random.choice(visitor_ids),
-            fake.date_this_year().isoformat(),
-            round(random.uniform(100, 5000), 2)  # Amount between 100 and 5000
-        )
-        for _ in range(num)
-    ]
-    cursor.executemany("""
-        INSERT INTO sales (artwork_id, visitor_id, sale_date, amount) VALUES (?, ?, ?, ?)
-    """, sales)
-
-# Generate data
-generate_artists()
-generate_exhibitions()
-generate_artworks()
-generate_visitors()
-generate_sales()
-
-# i_start = time.time()
-# i_end = time.time()
-# time_taken = round(i_end - i_start, 6)
-# print(
-#     f"INSERT operations take {time_taken} seconds."
-# )
-
-# Commit and close
-conn.commit()
-conn.close()
+
+    def write_sales(sales):
+        cursor.executemany("""
+            INSERT INTO sales (artwork_id, visitor_id, sale_date, amount) VALUES (?, ?, ?, ?)
+        """, sales)
+        conn.commit()
+
+    metrics = run_pipeline(
+        generate_chunks(
+            "sales", num, SALES_CHUNK_SIZE, SEED, SEED_WORKERS,
+            artwork_ids=artwork_ids, visitor_ids=visitor_ids
+        ),
+        write_sales,
+        SALES_QUEUE_SIZE,
+    )
+    print(f"sales: {metrics['rows']} rows in {metrics['chunks']} chunks, peak queue {metrics['peak_queue']}")
+
+if __name__ == "__main__":
+    conn = connect('gallery.db', PRAGMA_PROFILE)
+    cursor = conn.cursor()
+    migrate()
+
+    # Generate data
+    i_start = time.time()
+    generate_artists()
+    generate_exhibitions()
+    generate_artworks()
+    generate_visitors()
+    generate_sales()
+    i_end = time.time()
+    time_taken = round(i_end - i_start, 6)
+    print(
+        f"INSERT operations take {time_taken} seconds."
+    )
+
+    # Commit and close
+    conn.commit()
+    conn.close()
@@ -0,0 +1,103 @@
+"""Write strategies for SQLite insert benchmarks"""
+
+import time
+from itertools import islice
+
+# ==================================================
+# Configs
+# ==================================================
+
+STRATEGY_EXECUTE = "execute"  # one `execute` per row, one commit at the end
+STRATEGY_EXECUTEMANY = "executemany"  # one `executemany` per batch, one commit at the end
+STRATEGY_TRANSACTION = "transaction"  # `BEGIN` / per-row `execute` / `COMMIT` per batch
+STRATEGY_GENERATOR = "generator"  # one `executemany` fed lazily by a generator
+BATCH_SIZE = 1_000
+
+# ==================================================
+# Helper Functions
+# ==================================================
+
+def _batches(rows, batch_size: int):
+    """Yield lists of up to `batch_size` rows."""
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+# ==================================================
+# Strategies
+# ==================================================
+
+def insert_execute(conn, sql: str, rows, batch_size: int = BATCH_SIZE):
+    """Insert row by row with `execute`; Python's implicit transaction spans all rows."""
+    cursor = conn.cursor()
+    for row in rows:
+        cursor.execute(sql, row)
+    conn.commit()
+
+def insert_executemany(conn, sql: str, rows, batch_size: int = BATCH_SIZE):
+    """Insert `batch_size` rows per `executemany` call."""
+    cursor = conn.cursor()
+    for batch in _batches(rows, batch_size):
+        cursor.executemany(sql, batch)
+    conn.commit()
+
+def insert_transaction(conn, sql: str, rows, batch_size: int = BATCH_SIZE):
+    """Insert row by row inside an explicit `BEGIN` ... `COMMIT` per batch."""
+    conn.commit()  # An open implicit transaction would make `BEGIN` fail
+    cursor = conn.cursor()
+    for batch in _batches(rows, batch_size):
+        cursor.execute("BEGIN")
+        for row in batch:
+            cursor.execute(sql, row)
+        cursor.execute("COMMIT")
+
+def insert_generator(conn, sql: str, rows, batch_size: int = BATCH_SIZE):
+    """Insert every row with one `executemany` over a generator.
+
+    The statement is prepared once and rows are pulled one at a time,
+    so nothing is materialised however many rows there are.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(sql, (row for row in rows))
+    conn.commit()
+
+INSERT_STRATEGIES = {
+    STRATEGY_EXECUTE: insert_execute,
+    STRATEGY_EXECUTEMANY: insert_executemany,
+    STRATEGY_TRANSACTION: insert_transaction,
+    STRATEGY_GENERATOR: insert_generator,
+}
+
+def insert_rows(conn, sql: str, rows, strategy: str = STRATEGY_EXECUTEMANY, batch_size: int = BATCH_SIZE):
+    """Insert `rows` with one of `INSERT_STRATEGIES`."""
+    if strategy not in INSERT_STRATEGIES:
+        raise ValueError(f"Unknown strategy `{strategy}`, use one of {tuple(INSERT_STRATEGIES)}.")
+    INSERT_STRATEGIES[strategy](conn, sql, rows, batch_size)
+
+# ==================================================
+# Performance Measurement
+# ==================================================
+
+def measure_insert_strategies(conn, sql: str, rows, reset, strategies=None, batch_sizes=(BATCH_SIZE,)):
+    """Time each strategy over the same rows and print rows/s side by side.
+
+    `reset()` empties the table before every run. Batched strategies run
+    once per batch size. Return a list of (label, seconds, rows per second).
+    """
+    strategies = strategies or list(INSERT_STRATEGIES)
+    results = []
+    for strategy in strategies:
+        sizes = batch_sizes if strategy in (STRATEGY_EXECUTEMANY, STRATEGY_TRANSACTION) else (None,)
+        for batch_size in sizes:
+            reset()
+            conn.commit()
+            start = time.time()
+            insert_rows(conn, sql, rows, strategy, batch_size or BATCH_SIZE)
+            time_taken = time.time() - start
+            label = strategy if batch_size is None else f"{strategy} (batch {batch_size})"
+            results.append((label, time_taken, len(rows) / time_taken))
+
+    width = max(len(label) for label, _, _ in results)
+    for label, time_taken, rows_per_second in results:
+        print(f"{label:<{width}}\ttime taken: {time_taken:.6f} seconds\trows/s: {int(rows_per_second)}")
+    return results
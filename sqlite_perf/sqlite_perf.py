@@ -1,82 +1,156 @@
-"""SQLite Performance Testing"""
+"""SQLite Performance Testing
 
+    python sqlite_perf.py           # insert strategies, update and select
+    python sqlite_perf.py --sweep   # every PRAGMA profile x insert/update/select
+"""
+
+import os
+import sys
 import time
-import sqlite3
 
-from faker import Faker
+from insert_strategies import insert_rows, measure_insert_strategies
+from sqlite_profiles import connect, read_pragmas, PROFILES, PROFILE_DEFAULT
 
-fake = Faker()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench_datasets.dataset_cache import load_dataset
 
 print("SQLite\n\n")
 
 # Configs
-conn = sqlite3.connect("sqlite_perf.db")
-cursor = conn.cursor()
-
-# Migration if table NOT EXISTS
-cursor.execute("""
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        date_of_birth TEXT,
-        nationality TEXT
+DB_PATH = "sqlite_perf.db"
+PRAGMA_PROFILE = PROFILE_DEFAULT  # other profiles are compared by `--sweep`
+RECORDS_COUNT = 100_000
+INSERT_STRATEGY = None  # None compares all `INSERT_STRATEGIES`, or e.g. ["executemany"]
+BATCH_SIZES = [100, 1_000, 10_000]
+SWEEP_RECORDS_COUNT = 20_000
+SWEEP_STRATEGY = "transaction"  # commit per batch, so journal and fsync costs show
+SWEEP_BATCH_SIZE = 100
+
+INSERT_SQL = """
+    INSERT INTO students (name, date_of_birth, nationality) VALUES (?, ?, ?)
+"""
+UPDATE_SQL = """
+    UPDATE students SET date_of_birth = ? WHERE id = ?
+"""
+SELECT_SQL = """
+    SELECT * FROM students WHERE id = ?
+"""
+
+def migrate(conn):
+    """Migration if table NOT EXISTS"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            date_of_birth TEXT,
+            nationality TEXT
+        )
+    """)
+
+def reset_students(conn):
+    """Empty the students table and restart its ids"""
+    conn.execute("DELETE FROM students")
+    conn.execute('DELETE FROM sqlite_sequence WHERE name = "students"')
+
+def remove_db():
+    """Delete the database with its WAL files, so a new page size applies"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+
+# Read from the dataset cache, outside the timed regions
+def generate_students(count):
+    """Student rows for the insert workload"""
+    with load_dataset("students", count) as dataset:
+        return list(dataset.rows("full_name", "date_of_birth", "nationality"))
+
+def generate_dates(count):
+    """New dates of birth for the update workload: the next student's"""
+    with load_dataset("students", count) as dataset:
+        dates = list(dataset.column("date_of_birth"))
+    return dates[1:] + dates[:1]
+
+# Workloads
+def update_students(conn, dates, commit_every=None):
+    """Update students 1..len(dates) one by one, committing every `commit_every`"""
+    cursor = conn.cursor()
+    for i, date_of_birth in enumerate(dates, start=1):
+        cursor.execute(UPDATE_SQL, (date_of_birth, i))
+        if commit_every and i % commit_every == 0:
+            conn.commit()
+    conn.commit()
+
+def select_students(conn, count):
+    """Select students 1..count one by one by primary key"""
+    cursor = conn.cursor()
+    for i in range(1, count + 1):
+        cursor.execute(SELECT_SQL, (i,)).fetchone()
+
+def timed(func, *args):
+    """Seconds taken by `func(*args)`"""
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+### Profile Sweep
+#
+def sweep_profiles(count=SWEEP_RECORDS_COUNT):
+    """Run insert/update/select under every profile and print rows/s per profile"""
+    students, dates = generate_students(count), generate_dates(count)
+    workloads = ["insert", "update", "select"]
+    print(
+        f"PRAGMA profile sweep, {count} records (insert: {SWEEP_STRATEGY} batch {SWEEP_BATCH_SIZE},"
+        f" update: commit every {SWEEP_BATCH_SIZE}, select: by primary key), rows/s:"
     )
-""")
-cursor.execute("DELETE FROM students")
-cursor.execute('DELETE FROM sqlite_sequence WHERE name = "students"')
+    print("profile\t\t" + "\t".join(workloads) + "\tjournal_mode\tsynchronous\tpage_size")
+    for profile in PROFILES:
+        remove_db()
+        conn = connect(DB_PATH, profile)
+        migrate(conn)
+        times = [
+            timed(insert_rows, conn, INSERT_SQL, students, SWEEP_STRATEGY, SWEEP_BATCH_SIZE),
+            timed(update_students, conn, dates, SWEEP_BATCH_SIZE),
+            timed(select_students, conn, count),
+        ]
+        pragmas = read_pragmas(conn)
+        conn.close()
+        print(
+            f"{profile:<12}\t" + "\t".join(str(int(count / time_taken)) for time_taken in times)
+            + f"\t{pragmas['journal_mode']}\t\t{pragmas['synchronous']}\t\t{pragmas['page_size']}"
+        )
+    remove_db()
+
+if "--sweep" in sys.argv:
+    sweep_profiles()
+    sys.exit()
+
+conn = connect(DB_PATH, PRAGMA_PROFILE)
+migrate(conn)
 
 ### Insert Perf
 #
-RECORDS_COUNT = 100_000
-i_start = time.time()
-for _ in range(RECORDS_COUNT):
-    student = (
-        f"{fake.first_name()} {fake.last_name()}",
-        fake.date_of_birth(minimum_age=15, maximum_age=28).isoformat(),
-        fake.country()
-    )
-    cursor.execute("""
-        INSERT INTO students (name, date_of_birth, nationality) VALUES (?, ?, ?)
-    """, student)
-i_end = time.time()
-time_taken = round(i_end - i_start, 6)
-print(
-    f"INSERT operation of {RECORDS_COUNT} records => time taken: {time_taken} seconds"
+students = generate_students(RECORDS_COUNT)
+print(f"INSERT operation of {RECORDS_COUNT} records:")
+measure_insert_strategies(
+    conn, INSERT_SQL, students, lambda: reset_students(conn), INSERT_STRATEGY, BATCH_SIZES
 )
+print()
 
 ### Update Perf
 #
-RECORDS_COUNT = 100_000
-u_start = time.time()
-for i in range(RECORDS_COUNT):
-    student = (
-        fake.date_of_birth(minimum_age=15, maximum_age=28).isoformat(),
-        i
-    )
-    cursor.execute("""
-        UPDATE students SET date_of_birth = ? WHERE id = ?
-    """, student)
-u_end = time.time()
-time_taken = round(u_end - u_start, 6)
+dates = generate_dates(RECORDS_COUNT)
+time_taken = round(timed(update_students, conn, dates), 6)
 print(
     f"UPDATE operation of {RECORDS_COUNT} records => time taken: {time_taken} seconds"
 )
 
 ### Read Perf
 #
-RECORDS_COUNT = 100_000
-r_start = time.time()
-for i in range(RECORDS_COUNT):
-    cursor.execute("""
-        SELECT * FROM students WHERE id = ?
-    """, [i])
-r_end = time.time()
-time_taken = round(r_end - r_start, 6)
+time_taken = round(timed(select_students, conn, RECORDS_COUNT), 6)
 print(
     f"SELECT operation of {RECORDS_COUNT} records => time taken: {time_taken} seconds"
 )
 
 # Before Exit
 conn.commit()
-cursor.close()
 conn.close()